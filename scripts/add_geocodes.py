@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 """Add lat/lng coordinates to community.json entries for map display."""
 
-import json
+import re
 from pathlib import Path
 
+from json_io import dump_json, load_json
+
 # Pre-geocoded locations mapping
 COORDINATES = {
     # US Cities
@@ -73,33 +75,66 @@ COORDINATES = {
     "UC Berkeley": (37.8716, -122.2727),
 }
 
-def find_coordinates(location):
-    """Find coordinates for a location string."""
+# Single compiled alternation over all keys (longest first, so the most
+# specific key wins) - one C-level scan per location instead of a Python loop
+def _longest_first_pattern(keys):
+    return re.compile("|".join(re.escape(key) for key in sorted(keys, key=len, reverse=True)))
+
+KEY_PATTERN = _longest_first_pattern(COORDINATES)
+
+# City part of each key ("Boston, MA" -> "Boston"), first key wins
+CITY_PREFIX_TO_COORDS = {}
+for _key, _coords in COORDINATES.items():
+    CITY_PREFIX_TO_COORDS.setdefault(_key.split(",")[0].split("(")[0].strip(), _coords)
+
+CITY_PATTERN = _longest_first_pattern(CITY_PREFIX_TO_COORDS)
+
+def find_coordinates(location, known=None):
+    """Find coordinates for a location string.
+
+    known optionally maps location strings that are already geocoded to
+    their (lat, lng) and is checked before the table lookups.
+    """
     if not location or location == "Online" or location.startswith("Various"):
         return None
 
+    # Previously geocoded location
+    if known and location in known:
+        return known[location]
+
     # Direct match
     if location in COORDINATES:
         return COORDINATES[location]
 
-    # Try partial matching
+    # Try partial matching: a known key inside the location
+    match = KEY_PATTERN.search(location)
+    if match:
+        return COORDINATES[match.group()]
+
+    # ...or the location inside a known key
     for key, coords in COORDINATES.items():
-        if key in location or location in key:
+        if location in key:
             return coords
 
     # Check if it contains a known city
-    for key, coords in COORDINATES.items():
-        city = key.split(",")[0].split("(")[0].strip()
-        if city in location:
-            return coords
+    match = CITY_PATTERN.search(location)
+    if match:
+        return CITY_PREFIX_TO_COORDS[match.group()]
 
     return None
 
 def main():
     data_path = Path(__file__).parent.parent / "data" / "community.json"
 
-    with open(data_path) as f:
-        data = json.load(f)
+    data = load_json(data_path)
+
+    # Locations already geocoded in the file (including manual fixes) are
+    # reused by exact match, so repeat runs are mostly hash lookups
+    known = {
+        item["location"]: (item["lat"], item["lng"])
+        for item in data
+        if item.get("location") and "lat" in item and "lng" in item
+    }
 
     updated_count = 0
     skipped_locations = set()
@@ -116,7 +151,7 @@ def main():
         if "lat" in item and "lng" in item:
             continue
 
-        coords = find_coordinates(location)
+        coords = find_coordinates(location, known)
         if coords:
             item["lat"] = coords[0]
             item["lng"] = coords[1]
@@ -126,8 +161,7 @@ def main():
             skipped_locations.add(location)
 
     # Save updated data
-    with open(data_path, "w") as f:
-        json.dump(data, f, indent=2)
+    dump_json(data, data_path)
 
     print(f"\nUpdated {updated_count} entries with coordinates")
 
@@ -4,17 +4,17 @@ Add tags to all data files that don't have them.
 Uses category/type/topic/subtopic fields to generate tags.
 """
 
-import json
 from pathlib import Path
 
+from json_io import dump_json, load_json
+
 DATA_DIR = Path(__file__).parent.parent / "data"
 
 
 def add_tags_to_papers():
     """Add tags to papers.json using topic and subtopic names."""
     papers_file = DATA_DIR / "papers.json"
-    with open(papers_file) as f:
-        data = json.load(f)
+    data = load_json(papers_file)
 
     count = 0
     for topic in data.get("topics", []):
@@ -24,15 +24,12 @@ def add_tags_to_papers():
             for paper in subtopic.get("papers", []):
                 # Add tags if not already present
                 if "tags" not in paper or not paper["tags"]:
-                    paper["tags"] = []
-                    if topic_name:
-                        paper["tags"].append(topic_name)
-                    if subtopic_name:
-                        paper["tags"].append(subtopic_name)
+                    paper["tags"] = list(dict.fromkeys(
+                        name for name in (topic_name, subtopic_name) if name
+                    ))
                     count += 1
 
-    with open(papers_file, "w") as f:
-        json.dump(data, f, indent=2)
+    dump_json(data, papers_file)
 
     print(f"Papers: Added tags to {count} items")
     return count
@@ -41,22 +38,18 @@ def add_tags_to_papers():
 def add_tags_to_flat_file(filename, tag_fields):
     """Add tags to a flat JSON array file using specified fields."""
     filepath = DATA_DIR / filename
-    with open(filepath) as f:
-        data = json.load(f)
+    data = load_json(filepath)
 
     count = 0
     for item in data:
         if "tags" not in item or not item["tags"]:
-            item["tags"] = []
-            for field in tag_fields:
-                value = item.get(field, "")
-                if value and value not in item["tags"]:
-                    item["tags"].append(value)
+            # dict keys dedupe in O(1) while keeping field order
+            values = (item.get(field) for field in tag_fields)
+            item["tags"] = list(dict.fromkeys(value for value in values if value))
             if item["tags"]:
                 count += 1
 
-    with open(filepath, "w") as f:
-        json.dump(data, f, indent=2)
+    dump_json(data, filepath)
 
     print(f"{filename}: Added tags to {count} items")
     return count
@@ -7,18 +7,24 @@ search queries) to train an ALS model for item-item recommendations.
 """
 
 import subprocess
-import json
 import os
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from scipy.sparse import csr_matrix
+from scipy.sparse import coo_matrix
+
+from json_io import dump_json, parse_json
 
 try:
+    import implicit.gpu
     from implicit.als import AlternatingLeastSquares
 except ImportError:
     print("Please install implicit: pip install implicit")
     exit(1)
 
+# Rows of the item-item similarity matrix computed at a time (bounds peak
+# memory at SIMILARITY_BLOCK_ROWS x n_items instead of n_items x n_items)
+SIMILARITY_BLOCK_ROWS = 2048
+
 
 def fetch_d1_data(query):
     """Execute D1 query via wrangler and return results."""
@@ -27,8 +33,8 @@ def fetch_d1_data(query):
         '--remote', '--command', query, '--json'
     ]
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        data = json.loads(result.stdout)
+        result = subprocess.run(cmd, capture_output=True, check=True)
+        data = parse_json(result.stdout)
         if data and len(data) > 0 and 'results' in data[0]:
             return data[0]['results']
         return []
@@ -37,132 +43,132 @@ def fetch_d1_data(query):
         return []
 
 
+def column(records, key, lower=False, numeric=False):
+    """Extract one field from D1 result rows as a NumPy array."""
+    if numeric:
+        return np.array([r.get(key) or 0 for r in records], dtype=np.float64)
+    values = [r.get(key) or '' for r in records]
+    if lower:
+        values = [v.lower() for v in values]
+    return np.array(values, dtype=object)
+
+
+def item_totals(names, counts, items):
+    """Sum per-row counts into one total per item (aligned with items)."""
+    named = names != ''
+    codes = np.searchsorted(items, names[named])
+    return np.bincount(codes, weights=counts[named], minlength=len(items))
+
+
+def top_k_similar(factors, top_k):
+    """
+    Top-k cosine neighbours of every row of factors (excluding itself), best
+    first, as (ids, scores) arrays of shape (n_items, top_k).
+    """
+    norms = np.linalg.norm(factors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    factors = factors / norms
+
+    n_items = len(factors)
+    top_ids = np.empty((n_items, top_k), dtype=np.intp)
+    top_scores = np.empty((n_items, top_k), dtype=factors.dtype)
+    for start in range(0, n_items, SIMILARITY_BLOCK_ROWS):
+        stop = min(start + SIMILARITY_BLOCK_ROWS, n_items)
+        # Negated similarities, in place, so the k smallest are the k best
+        block = factors[start:stop] @ factors.T
+        np.negative(block, out=block)
+        rows = np.arange(stop - start)
+        block[rows, start + rows] = np.inf  # Exclude self
+
+        ids = np.argpartition(block, top_k - 1, axis=1)[:, :top_k]
+        neg_scores = np.take_along_axis(block, ids, axis=1)
+        order = np.argsort(neg_scores, axis=1)
+        top_ids[start:stop] = np.take_along_axis(ids, order, axis=1)
+        top_scores[start:stop] = -np.take_along_axis(neg_scores, order, axis=1)
+    return top_ids, top_scores
+
+
 def main():
     print("Fetching ALL interaction data from D1...")
 
-    # Fetch all interaction types
-    dwell = fetch_d1_data("SELECT session_id, name, dwell_ms FROM content_dwell")
+    # Fetch all interaction types concurrently (each query is a separate
+    # wrangler process, so they overlap instead of waiting on each other)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        dwell_future = executor.submit(fetch_d1_data, "SELECT session_id, name, dwell_ms FROM content_dwell")
+        clicks_future = executor.submit(fetch_d1_data, "SELECT name, click_count FROM content_clicks")
+        impressions_future = executor.submit(fetch_d1_data, "SELECT name, impression_count FROM content_impressions")
+        search_future = executor.submit(fetch_d1_data, "SELECT session_id, query, click_name FROM search_queries")
+
+    dwell = dwell_future.result()
     print(f"  Dwell records: {len(dwell)}")
 
-    clicks = fetch_d1_data("SELECT name, click_count FROM content_clicks")
+    clicks = clicks_future.result()
     print(f"  Click records: {len(clicks)}")
 
-    impressions = fetch_d1_data("SELECT name, impression_count FROM content_impressions")
+    impressions = impressions_future.result()
     print(f"  Impression records: {len(impressions)}")
 
-    search_queries = fetch_d1_data("SELECT session_id, query, click_name FROM search_queries")
+    search_queries = search_future.result()
     print(f"  Search query records: {len(search_queries)}")
 
+    # Pull each source into NumPy columns once; everything below is vectorized
+    dwell_sessions = column(dwell, 'session_id')
+    dwell_names = column(dwell, 'name', lower=True)
+    click_names = column(clicks, 'name', lower=True)
+    impression_names = column(impressions, 'name', lower=True)
+    search_sessions = column(search_queries, 'session_id')
+    search_names = column(search_queries, 'click_name', lower=True)
+
     # Collect all items from all sources
-    all_items = set()
-    for d in dwell:
-        if d.get('name'):
-            all_items.add(d['name'].lower())
-    for c in clicks:
-        if c.get('name'):
-            all_items.add(c['name'].lower())
-    for i in impressions:
-        if i.get('name'):
-            all_items.add(i['name'].lower())
-    for s in search_queries:
-        if s.get('click_name'):
-            all_items.add(s['click_name'].lower())
-
-    items = sorted(all_items)
+    all_names = np.concatenate([dwell_names, click_names, impression_names, search_names])
+    items = np.unique(all_names[all_names != ''])
     print(f"\n  Total unique items across all interactions: {len(items)}")
 
     if len(items) < 5:
         print("Not enough interaction data to train model")
         return
 
-    # Build session indices from all sources
-    sessions_set = set()
-    for d in dwell:
-        if d.get('session_id'):
-            sessions_set.add(d['session_id'])
-    for s in search_queries:
-        if s.get('session_id'):
-            sessions_set.add(s['session_id'])
-
-    # Create synthetic sessions for click/impression aggregates
-    # Each item with clicks/impressions gets a pseudo-session
-    synthetic_session_counter = 0
-    click_sessions = {}  # item -> synthetic session
-    impression_sessions = {}
-
-    for c in clicks:
-        name = c.get('name', '').lower()
-        if name and name not in click_sessions:
-            click_sessions[name] = f"__click_session_{synthetic_session_counter}"
-            sessions_set.add(click_sessions[name])
-            synthetic_session_counter += 1
-
-    for i in impressions:
-        name = i.get('name', '').lower()
-        if name and name not in impression_sessions:
-            impression_sessions[name] = f"__imp_session_{synthetic_session_counter}"
-            sessions_set.add(impression_sessions[name])
-            synthetic_session_counter += 1
-
-    sessions = sorted(sessions_set)
+    # Click/impression aggregates have no session: total them per item with
+    # np.bincount (names repeat across sections and letter case), then give
+    # each item one synthetic session per aggregate type
+    click_items = np.unique(click_names[click_names != ''])
+    click_weights = item_totals(click_names, column(clicks, 'click_count', numeric=True), items)
+    impression_items = np.unique(impression_names[impression_names != ''])
+    impression_weights = item_totals(impression_names, column(impressions, 'impression_count', numeric=True), items)
+
+    # Build user-item triples from ALL interaction types
+    row_sessions = np.concatenate([
+        dwell_sessions, '__click_session_' + click_items, '__imp_session_' + impression_items, search_sessions
+    ])
+    row_names = np.concatenate([dwell_names, click_items, impression_items, search_names])
+    row_scores = np.concatenate([
+        column(dwell, 'dwell_ms', numeric=True) / 1000.0,                         # 1. Dwell seconds (strongest signal)
+        click_weights[np.searchsorted(items, click_items)] * 10,                   # 2. Clicks weighted heavily
+        impression_weights[np.searchsorted(items, impression_items)] * 0.5,        # 3. Impressions are a weak positive
+        np.full(len(search_queries), 5.0),                                         # 4. Search click is strong intent
+    ])
+
+    has_session = np.concatenate([
+        dwell_sessions != '',
+        np.ones(len(click_items) + len(impression_items), dtype=bool),
+        search_sessions != '',
+    ])
+    sessions = np.unique(row_sessions[has_session])
     print(f"  Total sessions (real + synthetic): {len(sessions)}")
 
-    session_idx = {s: i for i, s in enumerate(sessions)}
-    item_idx = {it: i for i, it in enumerate(items)}
-    idx_to_item = {i: it for it, i in item_idx.items()}
-
-    # Build user-item matrix from ALL interaction types
-    interactions = defaultdict(float)  # (session_idx, item_idx) -> score
-
-    # 1. Dwell data (strongest signal)
-    for d in dwell:
-        session = d.get('session_id')
-        name = d.get('name', '').lower()
-        dwell_ms = d.get('dwell_ms', 0) or 0
-
-        if session in session_idx and name in item_idx:
-            key = (session_idx[session], item_idx[name])
-            interactions[key] += dwell_ms / 1000.0  # seconds
-
-    # 2. Click data (strong signal, use synthetic sessions)
-    for c in clicks:
-        name = c.get('name', '').lower()
-        count = c.get('click_count', 0) or 0
-
-        if name in click_sessions and name in item_idx:
-            session = click_sessions[name]
-            key = (session_idx[session], item_idx[name])
-            interactions[key] += count * 10  # Weight clicks heavily
-
-    # 3. Impression data (weak signal, use synthetic sessions)
-    for i in impressions:
-        name = i.get('name', '').lower()
-        count = i.get('impression_count', 0) or 0
-
-        if name in impression_sessions and name in item_idx:
-            session = impression_sessions[name]
-            key = (session_idx[session], item_idx[name])
-            interactions[key] += count * 0.5  # Weak positive
-
-    # 4. Search query clicks (strong signal)
-    for s in search_queries:
-        session = s.get('session_id')
-        click_name = s.get('click_name', '').lower() if s.get('click_name') else None
-
-        if session and click_name and session in session_idx and click_name in item_idx:
-            key = (session_idx[session], item_idx[click_name])
-            interactions[key] += 5.0  # Search click is strong intent
-
-    # Convert to sparse matrix
-    data, rows, cols = [], [], []
-    for (row, col), score in interactions.items():
-        rows.append(row)
-        cols.append(col)
-        data.append(score)
+    valid = has_session & (row_names != '')
+    rows = np.searchsorted(sessions, row_sessions[valid]).astype(np.int32)
+    cols = np.searchsorted(items, row_names[valid]).astype(np.int32)
 
+    # Convert to sparse matrix (duplicate (session, item) pairs are summed).
+    # int32 indices and float32 scores keep the COO -> CSR build compact.
     n_users = len(sessions)
     n_items = len(items)
-    user_item_matrix = csr_matrix((data, (rows, cols)), shape=(n_users, n_items))
+    user_item_matrix = coo_matrix(
+        (row_scores[valid].astype(np.float32), (rows, cols)), shape=(n_users, n_items)
+    ).tocsr()
+    user_item_matrix.sum_duplicates()
+    user_item_matrix.eliminate_zeros()
 
     print(f"\nBuilding matrix: {n_users} sessions x {n_items} items")
     print(f"  Non-zero entries: {user_item_matrix.nnz}")
@@ -175,47 +181,50 @@ def main():
     n_factors = min(32, min(n_users, n_items) - 1)
     n_factors = max(n_factors, 5)
 
+    # Conjugate-gradient solver, on the GPU when implicit was built with CUDA
+    use_gpu = implicit.gpu.HAS_CUDA
+    print(f"  Backend: {'GPU (CUDA)' if use_gpu else 'CPU'}")
+
     model = AlternatingLeastSquares(
         factors=n_factors,
         regularization=0.1,
         iterations=15,
+        use_cg=True,
+        use_gpu=use_gpu,
+        calculate_training_loss=False,
         random_state=42
     )
 
-    # Fit on item-user matrix for similar_items
-    item_user_matrix = user_item_matrix.T.tocsr()
-    model.fit(item_user_matrix)
+    # implicit >= 0.5 takes a user-item matrix (rows are sessions)
+    model.fit(user_item_matrix)
+    if use_gpu:
+        model = model.to_cpu()
 
     print(f"  Model trained with {n_factors} factors")
 
     # Generate item-item recommendations
     print("\nGenerating item recommendations...")
+    idx_to_item = dict(enumerate(items))
     recommendations = {}
     failed_items = []
 
-    for item_name, idx in item_idx.items():
-        try:
-            # Get similar items (request more to have buffer after filtering)
-            similar_ids, scores = model.similar_items(idx, N=10)
-
-            # Filter out self and format
-            similar_items = []
-            for sim_idx, score in zip(similar_ids, scores):
-                if sim_idx != idx and sim_idx in idx_to_item:
-                    # Only include if score is positive
-                    if float(score) > 0:
-                        similar_items.append({
-                            "name": idx_to_item[sim_idx],
-                            "score": round(float(score), 4)
-                        })
-
-            if similar_items:
-                recommendations[item_name] = similar_items[:5]
-            else:
-                failed_items.append(item_name)
-        except Exception as e:
-            failed_items.append(f"{item_name}: {str(e)}")
-            continue
+    # Top 5 neighbours per item by cosine similarity of the item factors,
+    # computed one block of rows at a time
+    top_k = min(5, n_items - 1)
+    top_ids, top_scores = top_k_similar(np.asarray(model.item_factors, dtype=np.float32), top_k)
+
+    for idx, item_name in idx_to_item.items():
+        # Only include positive scores
+        similar_items = [
+            {"name": idx_to_item[sim_idx], "score": round(score, 4)}
+            for sim_idx, score in zip(top_ids[idx].tolist(), top_scores[idx].tolist())
+            if score > 0
+        ]
+
+        if similar_items:
+            recommendations[item_name] = similar_items
+        else:
+            failed_items.append(item_name)
 
     print(f"  Generated recommendations for {len(recommendations)} items")
     if failed_items:
@@ -229,8 +238,7 @@ def main():
 
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    with open(output_path, 'w') as f:
-        json.dump(recommendations, f, indent=2)
+    dump_json(recommendations, output_path, indent=False)
 
     print(f"\nSaved to: {output_path}")
 
@@ -3,9 +3,10 @@
 Clean up packages.json by removing non-package items and moving them to resources.json
 """
 
-import json
 from pathlib import Path
 
+from json_io import dump_json, load_json
+
 DATA_DIR = Path(__file__).parent.parent / "data"
 
 # Items to REMOVE completely (duplicates already in resources.json)
@@ -75,15 +76,13 @@ ITEMS_TO_MOVE = {
 def main():
     # Load packages.json
     packages_file = DATA_DIR / "packages.json"
-    with open(packages_file, 'r') as f:
-        packages = json.load(f)
+    packages = load_json(packages_file)
 
     print(f"Loaded {len(packages)} packages")
 
     # Load resources.json
     resources_file = DATA_DIR / "resources.json"
-    with open(resources_file, 'r') as f:
-        resources = json.load(f)
+    resources = load_json(resources_file)
 
     print(f"Loaded {len(resources)} resources")
 
@@ -132,13 +131,11 @@ def main():
     print(f"  New resources total: {len(resources)}")
 
     # Save updated packages.json
-    with open(packages_file, 'w') as f:
-        json.dump(new_packages, f, indent=2)
+    dump_json(new_packages, packages_file)
     print(f"\nSaved {len(new_packages)} packages to {packages_file}")
 
     # Save updated resources.json
-    with open(resources_file, 'w') as f:
-        json.dump(resources, f, indent=2)
+    dump_json(resources, resources_file)
     print(f"Saved {len(resources)} resources to {resources_file}")
 
 if __name__ == "__main__":
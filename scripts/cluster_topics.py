@@ -5,17 +5,35 @@ Cluster items by topic using semantic embeddings.
 Uses K-means clustering on pre-computed embeddings to group similar content.
 Generates cluster labels from the most common topic_tags in each cluster.
 
-Output: data/topic_clusters.json
+Usage:
+    python3 scripts/cluster_topics.py                      # all items, K = max(100, N/5)
+    python3 scripts/cluster_topics.py --k auto             # pick K by inertia elbow
+    python3 scripts/cluster_topics.py --k 150 --no-include-career \
+        --output data/topic_clusters.json
+
+Output: data/topic_clusters_all.json (default)
 """
 
-import json
+import argparse
 import os
 import time
 import numpy as np
-from collections import Counter
 from pathlib import Path
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import pairwise_distances, silhouette_score
+from threadpoolctl import threadpool_limits
+
+from json_io import dump_json, load_json
+
+# Optional FAISS for fast multi-threaded K-means (on GPU with faiss-gpu)
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+    FAISS_GPU = faiss.get_num_gpus() > 0
+except ImportError:
+    FAISS_AVAILABLE = False
+    FAISS_GPU = False
 
 # Optional OpenAI for LLM labels
 try:
@@ -78,47 +96,84 @@ Label:"""
 
 
 def load_embeddings(embeddings_file: Path, count: int, dim: int) -> np.ndarray:
-    """Load binary Float32 embeddings."""
-    with open(embeddings_file, 'rb') as f:
-        data = np.frombuffer(f.read(), dtype=np.float32)
-    return data.reshape(count, dim)
+    """Memory-map binary Float32 embeddings (read-only, paged in on demand)."""
+    return np.memmap(embeddings_file, dtype=np.float32, mode='r', shape=(count, dim))
+
+
+def l2_normalize(embeddings: np.ndarray) -> np.ndarray:
+    """Return an L2-normalized float32 copy of the embeddings.
+
+    Copies once, then scales rows in place (FAISS's SIMD normalize_L2 when
+    installed) instead of materializing the norms and a second full-size
+    quotient array.
+    """
+    emb = np.array(embeddings, dtype=np.float32, order='C')
+    if FAISS_AVAILABLE:
+        faiss.normalize_L2(emb)
+        return emb
+
+    sq = np.einsum('ij,ij->i', emb, emb)
+    np.sqrt(sq, out=sq)
+    np.reciprocal(sq, out=sq)
+    emb *= sq[:, None]
+    return emb
 
 
 def load_metadata(metadata_file: Path) -> dict:
     """Load search metadata JSON."""
-    with open(metadata_file) as f:
-        return json.load(f)
+    return load_json(metadata_file)
 
 
-def extract_cluster_label(items: list, metadata_items: list, item_indices: list, use_llm: bool = True) -> tuple:
+def top_terms_per_cluster(terms_per_item: list, cluster_labels: np.ndarray,
+                          num_clusters: int, top_n: int) -> list:
+    """
+    Find the top_n most frequent terms (tags or categories) in every cluster.
+
+    Terms are encoded to integer IDs once and every (item, term) occurrence
+    becomes one entry; a single lexsort groups entries by (cluster, term), so
+    all counts come out of one vectorized pass. Ties keep the order in which
+    terms first appear within the cluster (same as Counter.most_common).
+    Returns a list (indexed by cluster ID) of term lists, most common first.
     """
-    Extract a descriptive label for a cluster.
+    vocab = {}
+    entry_term = np.array([vocab.setdefault(term, len(vocab))
+                           for terms in terms_per_item for term in terms], dtype=np.intp)
+
+    top_terms = [[] for _ in range(num_clusters)]
+    if not len(entry_term):
+        return top_terms
+
+    lengths = np.fromiter(map(len, terms_per_item), dtype=np.intp, count=len(terms_per_item))
+    entry_cluster = np.repeat(np.asarray(cluster_labels), lengths)
+    entry_pos = np.arange(len(entry_term))
+
+    # Group entries by (cluster, term); first entry of each group is its first appearance
+    order = np.lexsort((entry_pos, entry_term, entry_cluster))
+    group_cluster, group_term = entry_cluster[order], entry_term[order]
+    starts = np.flatnonzero(np.r_[True, (np.diff(group_cluster) != 0) | (np.diff(group_term) != 0)])
+    counts = np.diff(np.r_[starts, len(order)])
+    first_pos = entry_pos[order][starts]
+    group_cluster, group_term = group_cluster[starts], group_term[starts]
+
+    # Rank within each cluster: count descending, then first appearance
+    ranked = np.lexsort((first_pos, -counts, group_cluster))
+    boundaries = np.searchsorted(group_cluster[ranked], np.arange(num_clusters + 1))
+
+    id_to_term = list(vocab)
+    for cluster_id in range(num_clusters):
+        top_ids = group_term[ranked[boundaries[cluster_id]:boundaries[cluster_id + 1]][:top_n]]
+        top_terms[cluster_id] = [id_to_term[j] for j in top_ids]
+
+    return top_terms
+
+
+def extract_cluster_label(cluster_items: list, top_tags: list, top_categories: list,
+                          use_llm: bool = True) -> tuple:
+    """
+    Extract a descriptive label for a cluster from its most common tags/categories.
     Uses LLM if available, falls back to tag-based labels.
     Returns (label, top_tags, categories).
     """
-    all_tags = []
-    all_categories = []
-    cluster_items = []
-
-    for idx in item_indices:
-        item = metadata_items[idx]
-        cluster_items.append(item)
-        # Parse topic_tags (comma-separated string)
-        tags = item.get('topic_tags', '')
-        if tags:
-            all_tags.extend([t.strip() for t in tags.split(',')])
-        # Also collect categories
-        cat = item.get('category', '')
-        if cat:
-            all_categories.append(cat)
-
-    # Get most common tags and categories
-    tag_counts = Counter(all_tags)
-    cat_counts = Counter(all_categories)
-
-    top_tags = [tag for tag, _ in tag_counts.most_common(5)]
-    top_categories = [cat for cat, _ in cat_counts.most_common(3)]
-
     # Try LLM label first if available
     label = None
     if use_llm and OPENAI_AVAILABLE:
@@ -131,6 +186,14 @@ def extract_cluster_label(items: list, metadata_items: list, item_indices: list,
     return label, top_tags, top_categories
 
 
+# Boring/generic tags that make poor cluster labels
+SKIP_TAGS = frozenset({'career-portal', 'job-search', 'career-opportunities', 'job-board',
+                       'economist-roles', 'economist-jobs', 'careers', 'hiring'})
+
+# Hyphens and underscores separate words when comparing tags
+TAG_WORD_SEPARATORS = str.maketrans('-_', '  ')
+
+
 def generate_clean_label(tags: list, categories: list) -> str:
     """Generate a clean, non-repetitive label from tags."""
     # Clean up category (remove hierarchy markers)
@@ -144,37 +207,26 @@ def generate_clean_label(tags: list, categories: list) -> str:
     if not tags:
         return clean_categories[0] if clean_categories else "Miscellaneous"
 
-    # Normalize tags for comparison
-    def normalize(s):
-        return s.lower().replace('-', ' ').replace('_', ' ')
-
-    # Skip boring/generic tags
-    SKIP_TAGS = {'career-portal', 'job-search', 'career-opportunities', 'job-board',
-                 'economist-roles', 'economist-jobs', 'careers', 'hiring'}
-
-    # Dedupe tags that are too similar
-    seen_normalized = set()
+    # Dedupe tags that are too similar. Each tag's words are packed into an
+    # int bitmask over a per-call vocabulary, so word overlap is a popcount.
+    word_bits = {}
+    kept = []  # (normalized tag, word mask, word count) for each accepted tag
     unique_tags = []
     for tag in tags:
         if tag.lower() in SKIP_TAGS:
             continue
-        norm = normalize(tag)
-        # Skip if we've seen something very similar
-        is_dupe = False
-        for seen in seen_normalized:
-            # Check if one contains the other or they share >70% words
-            words1 = set(norm.split())
-            words2 = set(seen.split())
-            if words1 == words2 or norm in seen or seen in norm:
-                is_dupe = True
-                break
-            # High word overlap
-            if len(words1 & words2) >= max(len(words1), len(words2)) * 0.7:
-                is_dupe = True
-                break
-        if not is_dupe:
-            seen_normalized.add(norm)
-            unique_tags.append(tag)
+        norm = tag.lower().translate(TAG_WORD_SEPARATORS)
+        mask = 0
+        for word in norm.split():
+            mask |= 1 << word_bits.setdefault(word, len(word_bits))
+        size = mask.bit_count()
+        # Skip if one contains the other or they share >70% words
+        if any(mask == seen_mask or norm in seen or seen in norm
+               or (mask & seen_mask).bit_count() * 10 >= max(size, seen_size) * 7
+               for seen, seen_mask, seen_size in kept):
+            continue
+        kept.append((norm, mask, size))
+        unique_tags.append(tag)
         if len(unique_tags) >= 2:  # Only use 2 tags for cleaner labels
             break
 
@@ -248,16 +300,112 @@ def dedupe_labels(clusters: list) -> None:
             used_labels.add(new_label)
 
 
-def find_optimal_k(embeddings: np.ndarray, k_range: range) -> int:
-    """Find optimal K using silhouette score."""
+def run_kmeans(embeddings: np.ndarray, k: int) -> np.ndarray:
+    """Cluster embeddings into k groups, returning a label per row.
+
+    Uses FAISS spherical K-means (centroids kept on the unit sphere, to
+    match the L2-normalized embeddings) when installed, otherwise a
+    single-init k-means++ sklearn KMeans. With faiss-gpu and a visible GPU
+    the assignment step runs as a GPU GEMM; that only pays off once
+    N * K * dim reaches the billions; the CPU path is fine at today's
+    corpus size.
+    """
+    if FAISS_AVAILABLE:
+        x = np.ascontiguousarray(embeddings, dtype=np.float32)
+        kmeans = faiss.Kmeans(x.shape[1], k, niter=25, nredo=1, spherical=True, seed=42,
+                              gpu=FAISS_GPU)
+        kmeans.train(x)
+        _, labels = kmeans.index.search(x, 1)
+        return labels[:, 0]
+
+    # k-means++ seeding is already close to optimal on unit-norm vectors, so a
+    # single init suffices; Elkan's bounds skip most distance computations
+    kmeans = KMeans(n_clusters=k, init='k-means++', n_init=1, random_state=42,
+                    max_iter=300, algorithm='elkan')
+    return kmeans.fit_predict(embeddings)
+
+
+def kmeans_inertia(embeddings: np.ndarray, k: int) -> float:
+    """Fit a quick single-init K-means and return its inertia."""
+    # One thread per fit: the K sweep runs fits in parallel worker processes
+    with threadpool_limits(1):
+        return _kmeans_inertia(embeddings, k)
+
+
+def _kmeans_inertia(embeddings: np.ndarray, k: int) -> float:
+    if FAISS_AVAILABLE:
+        x = np.ascontiguousarray(embeddings, dtype=np.float32)
+        kmeans = faiss.Kmeans(x.shape[1], k, niter=15, seed=42)
+        kmeans.train(x)
+        # kmeans.obj only covers FAISS's training subsample (at most 256
+        # points per centroid), so score every point against the centroids
+        distances, _ = kmeans.index.search(x, 1)
+        return float(distances.sum())
+
+    kmeans = KMeans(n_clusters=k, random_state=42, n_init=1, max_iter=15)
+    return float(kmeans.fit(embeddings).inertia_)
+
+
+def find_elbow_k(embeddings: np.ndarray, k_range: range) -> int:
+    """
+    Find K at the elbow of the inertia curve (kneedle: the point furthest
+    below the chord between the first and last K). One cheap fit per K and
+    no pairwise silhouette distances.
+    """
+    print("Finding elbow K...")
+    ks = np.array(k_range, dtype=np.float64)
+    inertias = np.array(Parallel(n_jobs=-1)(delayed(kmeans_inertia)(embeddings, k) for k in k_range))
+    for k, inertia in zip(k_range, inertias):
+        print(f"  K={k}: inertia={inertia:.2f}")
+
+    if len(ks) < 3 or np.ptp(inertias) == 0:
+        return k_range.start
+
+    # Scale both axes to [0, 1]; inertia decreases, so the chord is y = 1 - x
+    x = (ks - ks[0]) / (ks[-1] - ks[0])
+    y = (inertias - inertias.min()) / np.ptp(inertias)
+    best_k = int(ks[np.argmax((1 - x) - y)])
+
+    print(f"Elbow at K={best_k}")
+    return best_k
+
+
+def silhouette_for_k(embeddings: np.ndarray, sample: np.ndarray,
+                     sample_distances: np.ndarray, k: int) -> float | None:
+    """Silhouette of an approximate K-means fit, scored on the sample."""
+    with threadpool_limits(1):
+        kmeans = MiniBatchKMeans(n_clusters=k, random_state=42, batch_size=4096, n_init=3, max_iter=100)
+        kmeans.fit(embeddings)
+        labels = kmeans.predict(sample)
+    if len(np.unique(labels)) < 2:
+        return None
+    return silhouette_score(sample_distances, labels, metric='precomputed')
+
+
+def find_optimal_k(embeddings: np.ndarray, k_range: range, method: str = 'elbow') -> int:
+    """Find optimal K by inertia elbow (default) or silhouette score."""
+    if method == 'elbow':
+        return find_elbow_k(embeddings, k_range)
+
     best_k = k_range.start
     best_score = -1
 
+    # Score every K on the same fixed subsample so its pairwise distance
+    # matrix is computed once; an approximate MiniBatchKMeans fit is enough
+    # to rank K (the final clustering is a full fit)
+    rng = np.random.default_rng(42)
+    sample_idx = np.sort(rng.choice(len(embeddings), min(2000, len(embeddings)), replace=False))
+    sample = np.asarray(embeddings[sample_idx])
+    sample_distances = pairwise_distances(sample)
+
+    # Each K is fit independently, so sweep them in parallel processes
     print("Finding optimal K...")
-    for k in k_range:
-        kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-        labels = kmeans.fit_predict(embeddings)
-        score = silhouette_score(embeddings, labels, sample_size=min(5000, len(embeddings)))
+    scores = Parallel(n_jobs=-1)(
+        delayed(silhouette_for_k)(embeddings, sample, sample_distances, k) for k in k_range
+    )
+    for k, score in zip(k_range, scores):
+        if score is None:
+            continue
         print(f"  K={k}: silhouette={score:.4f}")
         if score > best_score:
             best_score = score
@@ -267,11 +415,35 @@ def find_optimal_k(embeddings: np.ndarray, k_range: range) -> int:
     return best_k
 
 
+def parse_k(value: str):
+    """argparse type for --k: 'auto' or a positive integer."""
+    if value == 'auto':
+        return value
+    try:
+        k = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected 'auto' or an integer, got {value!r}")
+    if k < 2:
+        raise argparse.ArgumentTypeError("K must be at least 2")
+    return k
+
+
 def main():
-    # Paths
     project_root = Path(__file__).parent.parent
+
+    parser = argparse.ArgumentParser(description="Cluster items by topic using semantic embeddings")
+    parser.add_argument("--k", type=parse_k, default=None,
+                        help="Number of clusters, or 'auto' to pick K by inertia elbow "
+                             "(default: max(100, N/5))")
+    parser.add_argument("--output", type=Path, default=project_root / "data" / "topic_clusters_all.json",
+                        help="Output JSON path")
+    parser.add_argument("--include-career", action=argparse.BooleanOptionalAction, default=True,
+                        help="Include career items (default: yes)")
+    args = parser.parse_args()
+
+    # Paths
     embeddings_dir = project_root / "static" / "embeddings"
-    output_file = project_root / "data" / "topic_clusters_all.json"
+    output_file = args.output
 
     # Load metadata first to get count and dimensions
     print("Loading metadata...")
@@ -287,13 +459,23 @@ def main():
     all_embeddings = load_embeddings(embeddings_dir / "search-embeddings.bin", count, dim)
     print(f"  Loaded shape: {all_embeddings.shape}")
 
-    # Include all items for comprehensive explore view
-    print("\nUsing all items (including career)...")
-    filtered_indices = list(range(len(items)))
-    items_filtered = items
-    embeddings = all_embeddings
+    if args.include_career:
+        # Include all items for comprehensive explore view
+        print("\nUsing all items (including career)...")
+        items_filtered = items
+        embeddings = all_embeddings
+    else:
+        print("\nExcluding career items...")
+        filtered_indices = [i for i, item in enumerate(items) if item.get('type') != 'career']
+        items_filtered = [items[i] for i in filtered_indices]
+        embeddings = all_embeddings[filtered_indices]
     print(f"  Total: {len(items_filtered)} items")
 
+    # Parse the comma-separated tags and the category of each item once
+    tags_per_item = [[t for t in (tag.strip() for tag in tags.split(',')) if t] if tags else []
+                     for tags in (item.get('topic_tags') for item in items_filtered)]
+    cats_per_item = [[cat] if cat else [] for cat in (item.get('category') for item in items_filtered)]
+
     # LLM status
     if OPENAI_AVAILABLE:
         print("\nLLM labels: ENABLED (using GPT-4o-mini)")
@@ -301,35 +483,54 @@ def main():
         print("\nLLM labels: DISABLED (set OPENAI_API_KEY to enable)")
 
     # Normalize embeddings for better clustering
-    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-    embeddings_norm = embeddings / norms
-
-    # Adjust K based on filtered count (~5 items per cluster for granular topics)
-    optimal_k = max(100, len(items_filtered) // 5)
+    embeddings_norm = l2_normalize(embeddings)
+
+    n = len(items_filtered)
+    if args.k == 'auto':
+        # ~15 candidates between 20 and 3 items per cluster
+        optimal_k = find_optimal_k(embeddings_norm, range(max(2, n // 20), n // 3 + 1, max(1, n // 45)))
+    elif args.k:
+        optimal_k = args.k
+    else:
+        # Adjust K based on filtered count (~5 items per cluster for granular topics)
+        optimal_k = max(100, n // 5)
 
     # Run K-means clustering
-    print(f"\nRunning K-means with K={optimal_k}...")
-    kmeans = KMeans(n_clusters=optimal_k, random_state=42, n_init=10, max_iter=300)
-    cluster_labels = kmeans.fit_predict(embeddings_norm)
+    backend = ('FAISS GPU' if FAISS_GPU else 'FAISS') if FAISS_AVAILABLE else 'sklearn'
+    print(f"\nRunning K-means with K={optimal_k} ({backend})...")
+    cluster_labels = run_kmeans(embeddings_norm, optimal_k)
 
     # Build cluster data
     print("\nBuilding cluster profiles...")
     clusters = []
     item_to_cluster = {}
+    cluster_top_tags = top_terms_per_cluster(tags_per_item, cluster_labels, optimal_k, 5)
+    cluster_top_cats = top_terms_per_cluster(cats_per_item, cluster_labels, optimal_k, 3)
+
+    # Bucket item indices by cluster with one stable sort (keeps index order
+    # within each cluster) instead of a full label scan per cluster
+    order = np.argsort(cluster_labels, kind='stable')
+    boundaries = np.searchsorted(cluster_labels[order], np.arange(optimal_k + 1))
+
+    # Object arrays so each cluster's members are gathered by one fancy index
+    items_arr = np.empty(len(items_filtered), dtype=object)
+    items_arr[:] = items_filtered
+    ids_arr = np.array([item['id'] for item in items_filtered], dtype=object)
 
     for cluster_id in range(optimal_k):
         # Get indices of items in this cluster
-        indices = np.where(cluster_labels == cluster_id)[0].tolist()
+        indices = order[boundaries[cluster_id]:boundaries[cluster_id + 1]]
 
         # Extract label from common tags
-        label, top_tags, top_categories = extract_cluster_label(items_filtered, items_filtered, indices)
+        label, top_tags, top_categories = extract_cluster_label(
+            items_arr[indices].tolist(), cluster_top_tags[cluster_id], cluster_top_cats[cluster_id]
+        )
 
         # Get item IDs
-        item_ids = [items_filtered[i]['id'] for i in indices]
+        item_ids = ids_arr[indices].tolist()
 
         # Store mapping
-        for item_id in item_ids:
-            item_to_cluster[item_id] = cluster_id
+        item_to_cluster.update(dict.fromkeys(item_ids, cluster_id))
 
         # Sample items for display
         sample_items = item_ids[:10]
@@ -368,8 +569,7 @@ def main():
     }
 
     print(f"\nWriting output to {output_file}...")
-    with open(output_file, 'w') as f:
-        json.dump(output, f, indent=2)
+    dump_json(output, output_file, indent=False)
 
     print(f"Done! Generated {optimal_k} clusters.")
 
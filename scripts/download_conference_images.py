@@ -3,23 +3,52 @@
 
 import json
 import os
-import urllib.request
+import sys
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+except ImportError:
+    print("Error: requests not installed")
+    print("Install with: pip install requests")
+    sys.exit(1)
+
+from rate_limit import RateLimiter
+
+MAX_WORKERS = 8
+REQUESTS_PER_SECOND = 10
+TIMEOUT = 10
+
+RATE_LIMITER = RateLimiter(REQUESTS_PER_SECOND)
+
+# Pooled session shared by the download threads (connection reuse + retries)
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=MAX_WORKERS,
+    pool_maxsize=MAX_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
 def get_domain(url):
     """Extract domain from URL."""
     parsed = urllib.parse.urlparse(url)
     return parsed.netloc
 
+def favicon_filename(domain):
+    """Create safe filename from domain."""
+    return domain.replace(".", "-").replace("www-", "") + ".png"
+
 def download_favicon(url, output_dir):
     """Download favicon for a given URL."""
     domain = get_domain(url)
     if not domain:
         return None
 
-    # Create safe filename from domain
-    filename = domain.replace(".", "-").replace("www-", "") + ".png"
+    filename = favicon_filename(domain)
     output_path = Path(output_dir) / filename
 
     # Skip if already exists
@@ -31,7 +60,10 @@ def download_favicon(url, output_dir):
     favicon_url = f"https://www.google.com/s2/favicons?domain={domain}&sz=64"
 
     try:
-        urllib.request.urlretrieve(favicon_url, output_path)
+        RATE_LIMITER.wait()
+        response = SESSION.get(favicon_url, timeout=TIMEOUT)
+        response.raise_for_status()
+        output_path.write_bytes(response.content)
         print(f"  Downloaded: {filename}")
         return f"/images/conferences/{filename}"
     except Exception as e:
@@ -55,17 +87,21 @@ def main():
     print(f"Found {len(conferences)} conferences")
     print(f"Downloading favicons to: {output_dir}\n")
 
-    # Download favicons
-    updated = False
+    # Download favicons concurrently, once per output file (distinct URLs on
+    # the same domain share one favicon, so never fetch or write it twice)
+    file_urls = {}
     for conf in conferences:
-        name = conf.get("name", "Unknown")
-        url = conf.get("url", "")
-
-        if not url:
-            continue
+        domain = get_domain(conf.get("url", ""))
+        if domain:
+            file_urls.setdefault(favicon_filename(domain), conf["url"])
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        image_paths = dict(zip(file_urls, executor.map(
+            lambda url: download_favicon(url, output_dir), file_urls.values())))
 
-        print(f"Processing: {name}")
-        image_path = download_favicon(url, output_dir)
+    updated = False
+    for conf in conferences:
+        domain = get_domain(conf.get("url", ""))
+        image_path = image_paths.get(favicon_filename(domain)) if domain else None
 
         if image_path and not conf.get("image_url"):
             conf["image_url"] = image_path
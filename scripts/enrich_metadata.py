@@ -6,15 +6,16 @@ Adds: difficulty, prerequisites, topic_tags, summary, use_cases, audience, synth
 Usage:
     ANTHROPIC_API_KEY=sk-... python3 scripts/enrich_metadata.py [--file packages.json]
 
-Parallel usage (run each file independently):
-    ANTHROPIC_API_KEY=sk-... python3 scripts/enrich_metadata.py --file packages.json &
-    ANTHROPIC_API_KEY=sk-... python3 scripts/enrich_metadata.py --file datasets.json &
+Requests for each file are submitted together through the Message Batches
+API and the file is saved once the batch has ended.
 
 Resume: Script automatically skips items that already have 'difficulty' field.
+The id of each submitted batch is saved to data/.enrich_metadata_batch.json
+before polling, so a batch interrupted by Ctrl-C, a crash or a CI timeout is
+picked up (not resubmitted) on the next run.
 """
 
 import argparse
-import json
 import os
 import sys
 import time
@@ -27,6 +28,8 @@ except ImportError:
     print("Install with: pip install anthropic")
     sys.exit(1)
 
+from json_io import dump_json, load_json, parse_json
+
 DATA_DIR = Path(__file__).parent.parent / "data"
 
 # Files to enrich
@@ -40,12 +43,15 @@ DATA_FILES = [
     "books.json",
 ]
 
-# Rate limiting - 8 req/min per process allows 6 parallel processes under 50 req/min limit
-REQUESTS_PER_MINUTE = 8
-REQUEST_DELAY = 60.0 / REQUESTS_PER_MINUTE
+MODEL = "claude-sonnet-4-20250514"
+
+# Message Batches API: up to 10,000 requests per batch, processed
+# asynchronously (no per-minute rate limit, half the per-token price)
+MAX_BATCH_REQUESTS = 10000
+BATCH_POLL_SECONDS = 30
 
-# Batch save frequency
-SAVE_EVERY_N = 5
+# Submitted-but-unapplied batches: {filename: {"batch_id": ..., "items": {custom_id: name}}}
+BATCH_STATE_FILE = DATA_DIR / ".enrich_metadata_batch.json"
 
 
 def get_prompt(item, item_type):
@@ -98,40 +104,135 @@ RULES:
 JSON only, no explanation."""
 
 
-def enrich_item(client, item, item_type):
-    """Use Claude to enrich a single item with metadata."""
-    prompt = get_prompt(item, item_type)
+def parse_enrichment(text):
+    """Parse the model's JSON reply, tolerating a markdown code fence."""
+    text = text.strip()
+    # Remove markdown code blocks if present
+    if text.startswith("```"):
+        text = text.split("```")[1]
+        if text.startswith("json"):
+            text = text[4:]
+        text = text.strip()
 
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=600,
-            messages=[{"role": "user", "content": prompt}]
-        )
-
-        text = response.content[0].text.strip()
-        # Remove markdown code blocks if present
-        if text.startswith("```"):
-            text = text.split("```")[1]
-            if text.startswith("json"):
-                text = text[4:]
-            text = text.strip()
-
-        return json.loads(text)
-
-    except json.JSONDecodeError as e:
+        return parse_json(text)
+    except ValueError as e:
         print(f"    JSON parse error: {e}")
         return None
-    except Exception as e:
-        print(f"    API error: {e}")
+
+
+def apply_enrichment(item, enriched):
+    """Copy enriched fields onto an item, with defaults for missing keys."""
+    item["difficulty"] = enriched.get("difficulty", "intermediate")
+    item["prerequisites"] = enriched.get("prerequisites", [])
+    item["topic_tags"] = enriched.get("topic_tags", [])
+    item["summary"] = enriched.get("summary", "")
+    item["use_cases"] = enriched.get("use_cases", [])
+    item["audience"] = enriched.get("audience", [])
+    item["synthetic_questions"] = enriched.get("synthetic_questions", [])
+
+
+def load_batch_state():
+    """Load the submitted-batch state."""
+    if BATCH_STATE_FILE.exists():
+        return load_json(BATCH_STATE_FILE)
+    return {}
+
+
+def save_batch_state(state):
+    """Save the submitted-batch state, removing the file once nothing is pending."""
+    if state:
+        dump_json(state, BATCH_STATE_FILE)
+    else:
+        BATCH_STATE_FILE.unlink(missing_ok=True)
+
+
+def submit_batch(client, requests):
+    """Submit requests as one Message Batch and return its id, or None on API error."""
+    try:
+        batch = client.messages.batches.create(requests=requests)
+    except anthropic.APIError as e:
+        print(f"    API error submitting batch: {e}")
+        return None
+    print(f"  Submitted batch {batch.id} ({len(requests)} requests)")
+    return batch.id
+
+
+def wait_for_batch(client, batch_id):
+    """
+    Wait for a Message Batch to end and return {custom_id: reply text} for
+    the requests that succeeded, or None if the results could not be fetched.
+
+    Transient API errors while polling are retried on the next poll; the
+    batch keeps running server-side either way. A batch that no longer exists
+    (results expire after 29 days) gives {}.
+    """
+    while True:
+        try:
+            batch = client.messages.batches.retrieve(batch_id)
+        except (anthropic.APIConnectionError, anthropic.RateLimitError,
+                anthropic.InternalServerError) as e:
+            print(f"    API error polling batch {batch_id}, retrying: {e}")
+            time.sleep(BATCH_POLL_SECONDS)
+            continue
+        except anthropic.NotFoundError:
+            print(f"    Batch {batch_id} not found (expired?), dropping it")
+            return {}
+        except anthropic.APIError as e:
+            print(f"    API error polling batch {batch_id}: {e}")
+            return None
+
+        counts = batch.request_counts
+        print(f"    {batch.processing_status}: {counts.succeeded} succeeded, "
+              f"{counts.errored} errored, {counts.processing} processing")
+        if batch.processing_status == "ended":
+            break
+        time.sleep(BATCH_POLL_SECONDS)
+
+    replies = {}
+    try:
+        for entry in client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                replies[entry.custom_id] = entry.result.message.content[0].text
+            else:
+                print(f"    [{entry.custom_id}] {entry.result.type}")
+    except anthropic.APIError as e:
+        print(f"    API error fetching results of batch {batch_id}: {e}")
         return None
+    return replies
+
+
+def item_name(item):
+    """Name (or title) of an item."""
+    return item.get("name", item.get("title", ""))
 
 
-def save_file(filepath, data):
-    """Save data to JSON file."""
-    with open(filepath, "w") as f:
-        json.dump(data, f, indent=2)
-        f.write("\n")
+def apply_replies(data, replies, names):
+    """
+    Apply batch replies to the items they were requested for and return the
+    number enriched. names maps custom_id -> item name at submission time;
+    if the file was edited since and the item is no longer at the index in
+    its custom_id, it is found by name instead.
+    """
+    index_by_name = {}
+    for i, item in enumerate(data):
+        if "difficulty" not in item:
+            index_by_name.setdefault(item_name(item), i)
+
+    enriched_count = 0
+    for custom_id, text in replies.items():
+        name = names.get(custom_id)
+        i = int(custom_id[len("item-"):])
+        if i >= len(data) or "difficulty" in data[i] or item_name(data[i]) != name:
+            i = index_by_name.get(name)
+            if i is None or "difficulty" in data[i]:
+                print(f"    [{custom_id}] item no longer pending, skipping")
+                continue
+        enriched = parse_enrichment(text)
+        if enriched:
+            apply_enrichment(data[i], enriched)
+            enriched_count += 1
+    return enriched_count
 
 
 def enrich_file(client, filename, dry_run=False, limit=None):
@@ -141,68 +242,92 @@ def enrich_file(client, filename, dry_run=False, limit=None):
         print(f"Skipping {filename} (not found)")
         return 0
 
-    with open(filepath) as f:
-        data = json.load(f)
+    data = load_json(filepath)
 
     if not isinstance(data, list):
         print(f"Skipping {filename} (not a list)")
         return 0
 
     item_type = filename.replace(".json", "").rstrip("s")
-    enriched_count = 0
-    skipped_count = 0
-    pending_save = 0
 
-    already_enriched = sum(1 for item in data if "difficulty" in item)
-    to_enrich = len(data) - already_enriched
+    # Finish a batch submitted by an earlier, interrupted run first
+    batch_state = load_batch_state()
+    enriched_count = 0
+    attempted = 0
+    if filename in batch_state and not dry_run:
+        entry = batch_state[filename]
+        print(f"  Resuming batch {entry['batch_id']} from an earlier run")
+        replies = wait_for_batch(client, entry["batch_id"])
+        if replies is None:
+            return 0  # Keep the saved batch id and try again next run
+        attempted = len(entry["items"])
+        enriched_count = apply_replies(data, replies, entry["items"])
+        dump_json(data, filepath)
+        del batch_state[filename]
+        save_batch_state(batch_state)
+        print(f"    [Saved {enriched_count} items]")
+
+    # Items still missing enrichment; custom_id is the item's index in data
+    pending = [i for i, item in enumerate(data) if "difficulty" not in item]
+    done_count = len(data) - len(pending)
+    skipped_count = done_count - enriched_count  # Enriched before this run
 
     print(f"\n{'='*60}")
-    print(f"Processing {filename}: {already_enriched}/{len(data)} done, {to_enrich} remaining")
+    print(f"Processing {filename}: {done_count}/{len(data)} done, {len(pending)} remaining")
     print(f"{'='*60}")
 
-    for i, item in enumerate(data):
-        if "difficulty" in item:
-            skipped_count += 1
-            continue
-
-        if limit is not None and enriched_count >= limit:
-            print(f"  Reached limit of {limit} items")
+    if dry_run:
+        if limit is not None and len(pending) > limit:
+            print(f"  Limiting to {limit} items")
+            pending = pending[:limit]
+        for n, i in enumerate(pending, 1):
+            name = data[i].get("name", data[i].get("title", "unknown"))
+            print(f"  [{n}/{len(pending)}] {name[:50]}...")
+        print(f"  Done: {len(pending)} enriched, {skipped_count} skipped")
+        return len(pending)
+
+    # --limit caps successful enrichments (as when items were sent one at a
+    # time), so items that fail are made up for from the next batch
+    start = 0
+    while start < len(pending) and (limit is None or enriched_count < limit):
+        size = MAX_BATCH_REQUESTS if limit is None else min(MAX_BATCH_REQUESTS, limit - enriched_count)
+        chunk = pending[start:start + size]
+        start += len(chunk)
+
+        requests = [
+            {
+                "custom_id": f"item-{i}",
+                "params": {
+                    "model": MODEL,
+                    "max_tokens": 600,
+                    "messages": [{"role": "user", "content": get_prompt(data[i], item_type)}],
+                },
+            }
+            for i in chunk
+        ]
+        batch_id = submit_batch(client, requests)
+        if batch_id is None:
             break
 
-        name = item.get("name", item.get("title", "unknown"))
-        print(f"  [{enriched_count + 1}/{to_enrich}] {name[:50]}...")
-
-        if dry_run:
-            enriched_count += 1
-            continue
-
-        enriched = enrich_item(client, item, item_type)
-
-        if enriched:
-            item["difficulty"] = enriched.get("difficulty", "intermediate")
-            item["prerequisites"] = enriched.get("prerequisites", [])
-            item["topic_tags"] = enriched.get("topic_tags", [])
-            item["summary"] = enriched.get("summary", "")
-            item["use_cases"] = enriched.get("use_cases", [])
-            item["audience"] = enriched.get("audience", [])
-            item["synthetic_questions"] = enriched.get("synthetic_questions", [])
-            enriched_count += 1
-            pending_save += 1
-
-            if pending_save >= SAVE_EVERY_N:
-                save_file(filepath, data)
-                print(f"    [Saved {enriched_count} items]")
-                pending_save = 0
-        else:
-            print(f"    [FAILED - skipping]")
-
-        time.sleep(REQUEST_DELAY)
-
-    if not dry_run and pending_save > 0:
-        save_file(filepath, data)
-        print(f"  Final save: {enriched_count} items")
-
-    print(f"  Done: {enriched_count} enriched, {skipped_count} skipped")
+        # Record the batch before polling so an interrupted run can resume it
+        names = {f"item-{i}": item_name(data[i]) for i in chunk}
+        batch_state[filename] = {"batch_id": batch_id, "items": names}
+        save_batch_state(batch_state)
+
+        replies = wait_for_batch(client, batch_id)
+        if replies is None:
+            break  # Batch id stays saved; the next run resumes it
+        attempted += len(chunk)
+        enriched_count += apply_replies(data, replies, names)
+
+        # Checkpoint once per completed batch, then forget the batch
+        dump_json(data, filepath)
+        del batch_state[filename]
+        save_batch_state(batch_state)
+        print(f"    [Saved {enriched_count} items]")
+
+    failed = attempted - enriched_count
+    print(f"  Done: {enriched_count} enriched, {skipped_count} skipped, {failed} failed")
     return enriched_count
 
 
@@ -210,7 +335,8 @@ def main():
     parser = argparse.ArgumentParser(description="Enrich data files with LLM metadata")
     parser.add_argument("--dry-run", action="store_true", help="Don't make API calls")
     parser.add_argument("--file", type=str, help="Only process specific file")
-    parser.add_argument("--limit", type=int, help="Limit items to enrich")
+    parser.add_argument("--limit", type=int,
+                        help="Stop after this many items per file are enriched successfully")
     args = parser.parse_args()
 
     api_key = os.environ.get("ANTHROPIC_API_KEY")
@@ -56,7 +56,7 @@ MODEL_VERSION = "gpt-4o-mini"
 # Rate limiting - GPT-4o-mini has generous limits
 REQUESTS_PER_MINUTE = 60
 REQUEST_DELAY = 60.0 / REQUESTS_PER_MINUTE
-SAVE_EVERY_N = 10
+SAVE_EVERY_N = 25  # Data + state are rewritten in full, so checkpoint sparingly
 
 # Async batch processing settings
 BATCH_SIZE = 10  # Concurrent requests per batch (safe for 60 RPM limit)
@@ -658,6 +658,16 @@ PROMPT_MAP = {
 # State Management
 # =============================================================================
 
+def write_json_atomic(filepath: Path, data: Any) -> None:
+    """Write JSON to a temp file and rename it over the target, so an
+    interrupted write never leaves a truncated file behind."""
+    tmp_path = filepath.with_name(filepath.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, filepath)
+
+
 def load_state() -> dict:
     """Load enrichment state from file."""
     if STATE_FILE.exists():
@@ -673,9 +683,7 @@ def load_state() -> dict:
 def save_state(state: dict) -> None:
     """Save enrichment state to file."""
     state["last_run"] = datetime.now(timezone.utc).isoformat()
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=2)
-        f.write("\n")
+    write_json_atomic(STATE_FILE, state)
 
 
 def compute_hash(item: dict) -> str:
@@ -696,23 +704,17 @@ def needs_enrichment(item: dict, state: dict, file_key: str, force: bool = False
     if force:
         return True
 
-    item_id = get_item_id(item)
-    content_hash = compute_hash(item)
-
-    file_state = state.get("items", {}).get(file_key, {})
-
-    if item_id not in file_state:
-        return True
-
-    existing = file_state[item_id]
+    # Cheapest checks first: the content hash (JSON dump + SHA256) is only
+    # computed for items already recorded at the current schema version
+    existing = state.get("items", {}).get(file_key, {}).get(get_item_id(item))
 
-    if existing.get("content_hash") != content_hash:
+    if existing is None:
         return True
 
     if existing.get("schema_version", "1.0") < SCHEMA_VERSION:
         return True
 
-    return False
+    return existing.get("content_hash") != compute_hash(item)
 
 
 def update_state(state: dict, file_key: str, item: dict, confidence: float) -> None:
@@ -993,9 +995,7 @@ def apply_enrichment(item: dict, enrichment: dict, content_type: str) -> None:
 
 def save_file(filepath: Path, data: Any) -> None:
     """Save data to JSON file."""
-    with open(filepath, "w") as f:
-        json.dump(data, f, indent=2)
-        f.write("\n")
+    write_json_atomic(filepath, data)
 
 
 def process_flat_file(
@@ -1035,46 +1035,47 @@ def process_flat_file(
     enriched_count = 0
     pending_save = 0
 
-    for idx, item_idx in enumerate(to_enrich):
-        item = data[item_idx]
-        name = get_item_id(item)
-        print(f"  [{idx + 1}/{len(to_enrich)}] {name[:50]}...")
-
-        if dry_run:
-            enriched_count += 1
-            continue
-
-        enrichment, confidence = enrich_item(client, item, content_type)
+    try:
+        for idx, item_idx in enumerate(to_enrich):
+            item = data[item_idx]
+            name = get_item_id(item)
+            print(f"  [{idx + 1}/{len(to_enrich)}] {name[:50]}...")
 
-        if enrichment:
-            apply_enrichment(item, enrichment, content_type)
-            update_state(state, file_key, item, confidence)
-            enriched_count += 1
-            pending_save += 1
+            if dry_run:
+                enriched_count += 1
+                continue
 
-            # Log for review if needed
-            if confidence < 0.7:
-                log_for_review(item, enrichment, confidence, "low_confidence")
-                print(f"    [REVIEW NEEDED - confidence: {confidence:.2f}]")
-            elif confidence < 0.9:
-                print(f"    [OK - confidence: {confidence:.2f}]")
+            enrichment, confidence = enrich_item(client, item, content_type)
 
-            # Periodic save
-            if pending_save >= SAVE_EVERY_N:
-                save_file(filepath, data)
-                save_state(state)
-                print(f"    [Saved {enriched_count} items]")
-                pending_save = 0
-        else:
-            print(f"    [FAILED - skipping]")
+            if enrichment:
+                apply_enrichment(item, enrichment, content_type)
+                update_state(state, file_key, item, confidence)
+                enriched_count += 1
+                pending_save += 1
 
-        time.sleep(REQUEST_DELAY)
+                # Log for review if needed
+                if confidence < 0.7:
+                    log_for_review(item, enrichment, confidence, "low_confidence")
+                    print(f"    [REVIEW NEEDED - confidence: {confidence:.2f}]")
+                elif confidence < 0.9:
+                    print(f"    [OK - confidence: {confidence:.2f}]")
+
+                # Periodic save
+                if pending_save >= SAVE_EVERY_N:
+                    save_file(filepath, data)
+                    save_state(state)
+                    print(f"    [Saved {enriched_count} items]")
+                    pending_save = 0
+            else:
+                print(f"    [FAILED - skipping]")
 
-    # Final save
-    if not dry_run and pending_save > 0:
-        save_file(filepath, data)
-        save_state(state)
-        print(f"  Final save: {enriched_count} items")
+            time.sleep(REQUEST_DELAY)
+    finally:
+        # Final save (also on Ctrl-C / errors, so finished items are kept)
+        if not dry_run and pending_save > 0:
+            save_file(filepath, data)
+            save_state(state)
+            print(f"  Final save: {enriched_count} items")
 
     print(f"  Done: {enriched_count} enriched")
     return enriched_count
@@ -1120,33 +1121,43 @@ async def process_flat_file_async(
 
     enriched_count = 0
     failed_count = 0
+    pending_save = 0
 
     # Process in batches
-    for batch_start in range(0, len(items_to_enrich), BATCH_SIZE):
-        batch = items_to_enrich[batch_start:batch_start + BATCH_SIZE]
-        batch_items = [item for _, item in batch]
+    try:
+        for batch_start in range(0, len(items_to_enrich), BATCH_SIZE):
+            batch = items_to_enrich[batch_start:batch_start + BATCH_SIZE]
+            batch_items = [item for _, item in batch]
 
-        print(f"  Batch {batch_start // BATCH_SIZE + 1}: processing {len(batch)} items...")
+            print(f"  Batch {batch_start // BATCH_SIZE + 1}: processing {len(batch)} items...")
 
-        # Process batch concurrently
-        results = await process_batch_async(client, batch_items, content_type)
+            # Process batch concurrently
+            results = await process_batch_async(client, batch_items, content_type)
 
-        # Apply results
-        for (item_idx, item), (enrichment, confidence) in zip(batch, results):
-            if enrichment:
-                apply_enrichment(item, enrichment, content_type)
-                update_state(state, file_key, item, confidence)
-                enriched_count += 1
+            # Apply results
+            for (item_idx, item), (enrichment, confidence) in zip(batch, results):
+                if enrichment:
+                    apply_enrichment(item, enrichment, content_type)
+                    update_state(state, file_key, item, confidence)
+                    enriched_count += 1
+                    pending_save += 1
 
-                if confidence < 0.7:
-                    log_for_review(item, enrichment, confidence, "low_confidence")
-            else:
-                failed_count += 1
+                    if confidence < 0.7:
+                        log_for_review(item, enrichment, confidence, "low_confidence")
+                else:
+                    failed_count += 1
 
-        # Save after each batch
-        save_file(filepath, data)
-        save_state(state)
-        print(f"    [Saved batch: {enriched_count} enriched, {failed_count} failed]")
+            # Periodic save
+            if pending_save >= SAVE_EVERY_N:
+                save_file(filepath, data)
+                save_state(state)
+                print(f"    [Saved: {enriched_count} enriched, {failed_count} failed]")
+                pending_save = 0
+    finally:
+        if pending_save > 0:
+            save_file(filepath, data)
+            save_state(state)
+            print(f"  Final save: {enriched_count} items")
 
     print(f"  Done: {enriched_count} enriched, {failed_count} failed")
     return enriched_count
@@ -1204,41 +1215,42 @@ def process_papers_file(
     enriched_count = 0
     pending_save = 0
 
-    for idx, paper_info in enumerate(papers_to_enrich):
-        paper = paper_info["paper"]
-        title = paper.get("title", "unknown")
-        print(f"  [{idx + 1}/{len(papers_to_enrich)}] {title[:50]}...")
-
-        if dry_run:
-            enriched_count += 1
-            continue
+    try:
+        for idx, paper_info in enumerate(papers_to_enrich):
+            paper = paper_info["paper"]
+            title = paper.get("title", "unknown")
+            print(f"  [{idx + 1}/{len(papers_to_enrich)}] {title[:50]}...")
 
-        enrichment, confidence = enrich_item(client, paper, content_type)
+            if dry_run:
+                enriched_count += 1
+                continue
 
-        if enrichment:
-            apply_enrichment(paper, enrichment, content_type)
-            update_state(state, file_key, paper, confidence)
-            enriched_count += 1
-            pending_save += 1
+            enrichment, confidence = enrich_item(client, paper, content_type)
 
-            if confidence < 0.7:
-                log_for_review(paper, enrichment, confidence, "low_confidence")
-                print(f"    [REVIEW NEEDED - confidence: {confidence:.2f}]")
+            if enrichment:
+                apply_enrichment(paper, enrichment, content_type)
+                update_state(state, file_key, paper, confidence)
+                enriched_count += 1
+                pending_save += 1
 
-            if pending_save >= SAVE_EVERY_N:
-                save_file(filepath, data)
-                save_state(state)
-                print(f"    [Saved {enriched_count} items]")
-                pending_save = 0
-        else:
-            print(f"    [FAILED - skipping]")
+                if confidence < 0.7:
+                    log_for_review(paper, enrichment, confidence, "low_confidence")
+                    print(f"    [REVIEW NEEDED - confidence: {confidence:.2f}]")
 
-        time.sleep(REQUEST_DELAY)
+                if pending_save >= SAVE_EVERY_N:
+                    save_file(filepath, data)
+                    save_state(state)
+                    print(f"    [Saved {enriched_count} items]")
+                    pending_save = 0
+            else:
+                print(f"    [FAILED - skipping]")
 
-    if not dry_run and pending_save > 0:
-        save_file(filepath, data)
-        save_state(state)
-        print(f"  Final save: {enriched_count} items")
+            time.sleep(REQUEST_DELAY)
+    finally:
+        if not dry_run and pending_save > 0:
+            save_file(filepath, data)
+            save_state(state)
+            print(f"  Final save: {enriched_count} items")
 
     print(f"  Done: {enriched_count} enriched")
     return enriched_count
@@ -1299,34 +1311,44 @@ async def process_papers_file_async(
 
     enriched_count = 0
     failed_count = 0
+    pending_save = 0
 
     # Process in batches
-    for batch_start in range(0, len(papers_to_enrich), BATCH_SIZE):
-        batch = papers_to_enrich[batch_start:batch_start + BATCH_SIZE]
-        batch_papers = [info["paper"] for info in batch]
+    try:
+        for batch_start in range(0, len(papers_to_enrich), BATCH_SIZE):
+            batch = papers_to_enrich[batch_start:batch_start + BATCH_SIZE]
+            batch_papers = [info["paper"] for info in batch]
 
-        print(f"  Batch {batch_start // BATCH_SIZE + 1}: processing {len(batch)} papers...")
+            print(f"  Batch {batch_start // BATCH_SIZE + 1}: processing {len(batch)} papers...")
 
-        # Process batch concurrently
-        results = await process_batch_async(client, batch_papers, content_type)
+            # Process batch concurrently
+            results = await process_batch_async(client, batch_papers, content_type)
 
-        # Apply results
-        for paper_info, (enrichment, confidence) in zip(batch, results):
-            paper = paper_info["paper"]
-            if enrichment:
-                apply_enrichment(paper, enrichment, content_type)
-                update_state(state, file_key, paper, confidence)
-                enriched_count += 1
+            # Apply results
+            for paper_info, (enrichment, confidence) in zip(batch, results):
+                paper = paper_info["paper"]
+                if enrichment:
+                    apply_enrichment(paper, enrichment, content_type)
+                    update_state(state, file_key, paper, confidence)
+                    enriched_count += 1
+                    pending_save += 1
 
-                if confidence < 0.7:
-                    log_for_review(paper, enrichment, confidence, "low_confidence")
-            else:
-                failed_count += 1
+                    if confidence < 0.7:
+                        log_for_review(paper, enrichment, confidence, "low_confidence")
+                else:
+                    failed_count += 1
 
-        # Save after each batch
-        save_file(filepath, data)
-        save_state(state)
-        print(f"    [Saved batch: {enriched_count} enriched, {failed_count} failed]")
+            # Periodic save
+            if pending_save >= SAVE_EVERY_N:
+                save_file(filepath, data)
+                save_state(state)
+                print(f"    [Saved: {enriched_count} enriched, {failed_count} failed]")
+                pending_save = 0
+    finally:
+        if pending_save > 0:
+            save_file(filepath, data)
+            save_state(state)
+            print(f"  Final save: {enriched_count} items")
 
     print(f"  Done: {enriched_count} enriched, {failed_count} failed")
     return enriched_count
@@ -11,28 +11,45 @@ Usage:
 import argparse
 import json
 import sys
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from urllib.parse import urlparse
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 except ImportError:
     print("Error: requests not installed")
     print("Install with: pip install requests")
     sys.exit(1)
 
+from rate_limit import RateLimiter
+
 DATA_DIR = Path(__file__).parent.parent / "data"
 OUTPUT_DIR = Path(__file__).parent.parent / "static" / "images" / "logos"
 
-# Rate limiting
-REQUEST_DELAY = 0.3
+# Concurrency and rate limiting (shared across all worker threads)
+MAX_WORKERS = 16
+REQUESTS_PER_SECOND = 30
 TIMEOUT = 10
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
 }
 
+RATE_LIMITER = RateLimiter(REQUESTS_PER_SECOND)
+
+# One pooled session for all threads: reuses TLS connections and retries
+# transient failures inside the adapter
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
 
 def get_root_domain(url):
     """Extract root domain from URL (e.g., uber.com from eng.uber.com)."""
@@ -56,16 +73,30 @@ def get_root_domain(url):
         return None
 
 
+def find_existing_logo(existing_logos, domain):
+    """
+    Find a logo already on disk for a domain.
+
+    New logos are saved as "<domain>.png"; older ones were saved with the
+    last domain label dropped ("aeaweb.org" -> "aeaweb.png", "tfl.gov.uk" ->
+    "tfl.gov.png") and are still referenced from the data files, so fall
+    back to that name.
+    """
+    return existing_logos.get(domain) or existing_logos.get(Path(domain).stem)
+
+
 def download_logo(domain, output_path):
     """Try to download logo from Clearbit, fallback to Google Favicon."""
 
     # Try Clearbit Logo API first (higher quality)
     clearbit_url = f"https://logo.clearbit.com/{domain}"
     try:
-        response = requests.get(clearbit_url, headers=HEADERS, timeout=TIMEOUT)
+        RATE_LIMITER.wait()
+        response = SESSION.get(clearbit_url, timeout=TIMEOUT)
         if response.status_code == 200 and len(response.content) > 1000:
-            # Clearbit returns PNG
-            final_path = output_path.with_suffix(".png")
+            # Clearbit returns PNG. Append the suffix rather than
+            # with_suffix(), which would turn "scipy.org" into "scipy.png"
+            final_path = output_path.with_name(f"{output_path.name}.png")
             with open(final_path, "wb") as f:
                 f.write(response.content)
             return final_path
@@ -75,9 +106,10 @@ def download_logo(domain, output_path):
     # Fallback to Google Favicon API (128px)
     google_url = f"https://www.google.com/s2/favicons?sz=128&domain={domain}"
     try:
-        response = requests.get(google_url, headers=HEADERS, timeout=TIMEOUT)
+        RATE_LIMITER.wait()
+        response = SESSION.get(google_url, timeout=TIMEOUT)
         if response.status_code == 200 and len(response.content) > 500:
-            final_path = output_path.with_suffix(".png")
+            final_path = output_path.with_name(f"{output_path.name}.png")
             with open(final_path, "wb") as f:
                 f.write(response.content)
             return final_path
@@ -102,8 +134,15 @@ def process_file(filepath, dry_run=False):
     failed = 0
     already_have = 0
 
-    # Track domains we've already processed
-    processed_domains = set()
+    # Logos already on disk, keyed by file stem ("uber.com.png" -> "uber.com"),
+    # so lookups don't rescan the directory for every item
+    existing_logos = {}
+    for path in sorted(OUTPUT_DIR.iterdir()):
+        if path.is_file():
+            existing_logos.setdefault(path.stem, path)
+
+    # Domains to fetch this run (first item name, for logging)
+    pending_domains = {}
 
     for item in data:
         name = item.get("name", item.get("title", "Unknown"))
@@ -123,43 +162,38 @@ def process_file(filepath, dry_run=False):
             continue
 
         # Check if we already have this logo
-        existing = list(OUTPUT_DIR.glob(f"{domain}.*"))
+        existing = find_existing_logo(existing_logos, domain)
         if existing:
-            local_path = f"/images/logos/{existing[0].name}"
+            local_path = f"/images/logos/{existing.name}"
             item["image_url"] = local_path
             updated += 1
             skipped += 1
             continue
 
-        # Skip if we already tried this domain this run
-        if domain in processed_domains:
-            # But still update the item to use the logo if it exists
-            existing = list(OUTPUT_DIR.glob(f"{domain}.*"))
-            if existing:
-                item["image_url"] = f"/images/logos/{existing[0].name}"
-                updated += 1
+        # Items sharing a domain are filled in by the second pass
+        if domain in pending_domains:
             continue
 
-        processed_domains.add(domain)
-
+        pending_domains[domain] = name
         print(f"  {name[:40]:40} → {domain}")
 
-        if dry_run:
-            continue
-
-        output_path = OUTPUT_DIR / domain
-        downloaded = download_logo(domain, output_path)
-
-        if downloaded:
-            local_path = f"/images/logos/{downloaded.name}"
-            item["image_url"] = local_path
-            updated += 1
-            print(f"    ✓ Downloaded: {downloaded.name}")
-        else:
-            failed += 1
-            print(f"    ✗ No logo found")
-
-        time.sleep(REQUEST_DELAY)
+    # Download missing logos concurrently (network-bound)
+    if not dry_run and pending_domains:
+        print(f"\nDownloading {len(pending_domains)} logos...")
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(download_logo, domain, OUTPUT_DIR / domain): domain
+                for domain in pending_domains
+            }
+            for future in as_completed(futures):
+                domain = futures[future]
+                downloaded = future.result()
+                if downloaded:
+                    existing_logos[domain] = downloaded
+                    print(f"    ✓ Downloaded: {downloaded.name}")
+                else:
+                    failed += 1
+                    print(f"    ✗ No logo found for {domain}")
 
     # Second pass: update all items with same domain
     if not dry_run:
@@ -171,9 +205,9 @@ def process_file(filepath, dry_run=False):
                 continue
             domain = get_root_domain(url)
             if domain:
-                existing = list(OUTPUT_DIR.glob(f"{domain}.*"))
+                existing = find_existing_logo(existing_logos, domain)
                 if existing:
-                    item["image_url"] = f"/images/logos/{existing[0].name}"
+                    item["image_url"] = f"/images/logos/{existing.name}"
                     updated += 1
 
     if not dry_run and updated > 0:
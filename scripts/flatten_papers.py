@@ -8,13 +8,18 @@ papers_flat.json: Flat array matching other content types
 
 import json
 import re
+from collections import defaultdict
 from pathlib import Path
 
 
+NON_SLUG_CHARS = re.compile(r'[^a-z0-9]+')
+
+
 def slugify(text: str) -> str:
     """Convert text to URL-safe slug (matches JS slugify in explore.js)."""
-    slug = re.sub(r'[^a-z0-9]+', '-', text.lower())
-    return re.sub(r'^-|-$', '', slug)[:100]
+    # Runs collapse to a single hyphen, so strip('-') trims the same
+    # (at most one) leading/trailing hyphen as JS's /^-|-$/g
+    return NON_SLUG_CHARS.sub('-', text.lower()).strip('-')[:100]
 
 
 def flatten_papers(data_dir: Path) -> list:
@@ -23,7 +28,7 @@ def flatten_papers(data_dir: Path) -> list:
         data = json.load(f)
 
     items = []
-    seen_ids = {}
+    seen_ids = defaultdict(int)  # base_id -> times seen so far
 
     for topic in data.get('topics', []):
         topic_name = topic.get('name', '')
@@ -34,12 +39,9 @@ def flatten_papers(data_dir: Path) -> list:
                 base_id = f"paper-{slugify(title)}"
 
                 # Handle duplicate IDs by appending suffix
-                if base_id in seen_ids:
-                    seen_ids[base_id] += 1
-                    item_id = f"{base_id}-{seen_ids[base_id]}"
-                else:
-                    seen_ids[base_id] = 0
-                    item_id = base_id
+                n = seen_ids[base_id]
+                item_id = base_id if n == 0 else f"{base_id}-{n}"
+                seen_ids[base_id] = n + 1
 
                 items.append({
                     'id': item_id,
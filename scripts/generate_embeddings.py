@@ -2,7 +2,11 @@
 """
 Generate vector embeddings and MiniSearch index for semantic search.
 
-Uses sentence-transformers to create embeddings for all items in the data files.
+Uses sentence-transformers to create embeddings for all items in the data files,
+or an INT8-quantized ONNX export of the same model (run with ONNX Runtime) when
+one has been created with --export-onnx. Content types whose embedding texts
+are unchanged since the last run (per-type hashes in search-metadata.json)
+reuse their rows from search-embeddings.bin instead of being re-encoded.
 Outputs:
   - search-metadata.json: Item data + IDs (for client-side use)
   - search-embeddings.bin: Binary Float32 embeddings (~1MB vs 2.5MB JSON)
@@ -12,19 +16,168 @@ Outputs:
 
 import argparse
 import hashlib
-import json
+import os
+import queue
+import re
 import struct
 import sys
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Any
 
+from json_io import dump_json, dumps_json, load_json
+
+
+MODEL_NAME = 'BAAI/bge-large-en-v1.5'
+EMBEDDING_DIM = 1024
+
+# INT8 ONNX export of MODEL_NAME (created with --export-onnx, not committed)
+ONNX_DIR = Path(__file__).parent / "onnx" / "bge-large-en-v1.5"
+ONNX_MODEL_FILE = ONNX_DIR / "model.int8.onnx"
+
+# Texts per forward pass; both encoders sort texts by length first, so
+# each batch only pads to its own longest text
+EMBED_BATCH_SIZE = 64
+
+
+class OnnxEncoder:
+    """
+    Dynamically INT8-quantized ONNX export of the embedding model, run with
+    ONNX Runtime. Implements the part of SentenceTransformer.encode() used
+    here: CLS pooling (as bge-large-en-v1.5 does) and L2 normalization.
+    """
+
+    def __init__(self, model_dir: Path):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = os.cpu_count() or 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.enable_mem_pattern = True  # Reuse the memory plan across batches
+        self.session = ort.InferenceSession(
+            str(model_dir / "model.int8.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=512)
+        self.tokenizer.enable_padding()  # Pad to the longest text in each batch
+
+    def tokenize(self, texts: List[str]) -> Dict[str, Any]:
+        """Tokenize one batch into the session's input arrays."""
+        import numpy as np
+
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        }
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        return feeds
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False,
+               normalize_embeddings: bool = True):
+        import numpy as np
+
+        # Encode longest-first so each batch pads to similar lengths (as
+        # SentenceTransformer.encode does), then restore the input order
+        order = np.argsort([-len(t) for t in texts], kind='stable')
+        sorted_texts = [texts[i] for i in order]
+
+        # Tokenize in a background thread while the session runs the batch
+        # before it; both release the GIL, so the two stages overlap
+        batches = queue.Queue(maxsize=4)  # Bounds tokenized batches held in memory
+
+        def tokenize_batches():
+            try:
+                for start in range(0, len(texts), batch_size):
+                    batches.put(self.tokenize(sorted_texts[start:start + batch_size]))
+            except Exception as e:
+                batches.put(e)
+            batches.put(None)
+
+        threading.Thread(target=tokenize_batches, daemon=True).start()
+
+        pooled = []
+        done = 0
+        while (feeds := batches.get()) is not None:
+            if isinstance(feeds, Exception):
+                raise feeds
+            last_hidden_state = self.session.run(None, feeds)[0]
+            pooled.append(last_hidden_state[:, 0])
+            done += len(last_hidden_state)
+            if show_progress_bar:
+                print(f"  Encoded {done}/{len(texts)}", end="\r")
+        if show_progress_bar:
+            print()
+
+        embeddings = np.empty((len(texts), pooled[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.concatenate(pooled)
+        if normalize_embeddings:
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings
+
+
+def export_onnx_model(model_dir: Path = ONNX_DIR):
+    """Export MODEL_NAME to ONNX and write a dynamically INT8-quantized copy."""
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+    except ImportError:
+        print("Error: optimum not installed")
+        print("Install with: pip install 'optimum[onnxruntime]'")
+        sys.exit(1)
+
+    print(f"Exporting {MODEL_NAME} to ONNX in {model_dir}...")
+    ORTModelForFeatureExtraction.from_pretrained(MODEL_NAME, export=True).save_pretrained(model_dir)
+    AutoTokenizer.from_pretrained(MODEL_NAME).save_pretrained(model_dir)  # Writes tokenizer.json
+
+    print("Quantizing weights to INT8...")
+    quantize_dynamic(
+        model_input=model_dir / "model.onnx",
+        model_output=model_dir / "model.int8.onnx",
+        weight_type=QuantType.QInt8,
+    )
+
+
+# Global model, loaded once per process
+_model = None
+
 
 def get_model():
-    """Load the sentence-transformers model."""
+    """Get or load the embedding model (see load_model)."""
+    global _model
+    if _model is None:
+        _model = load_model()
+    return _model
+
+
+def use_onnx() -> bool:
+    """True if the INT8 ONNX export exists and its runtime is installed."""
+    import importlib.util
+    return ONNX_MODEL_FILE.exists() and all(
+        importlib.util.find_spec(module) for module in ("onnxruntime", "tokenizers"))
+
+
+def encoder_id() -> str:
+    """Identify the encoder load_model() picks (model + backend/quantization)."""
+    return f"{MODEL_NAME}:{'onnx-int8' if use_onnx() else 'sentence-transformers-fp32'}"
+
+
+def load_model():
+    """Load the INT8 ONNX model if it has been exported, else sentence-transformers."""
+    if use_onnx():
+        return OnnxEncoder(ONNX_DIR)
+    if ONNX_MODEL_FILE.exists():
+        print("Warning: onnxruntime/tokenizers not installed, using sentence-transformers")
+
     try:
         from sentence_transformers import SentenceTransformer
-        return SentenceTransformer('BAAI/bge-large-en-v1.5')
+        return SentenceTransformer(MODEL_NAME)
     except ImportError:
         print("Error: sentence-transformers not installed")
         print("Install with: pip install sentence-transformers")
@@ -86,8 +239,7 @@ def load_papers(data_dir: Path) -> List[Dict[str, Any]]:
         print(f"Warning: papers.json not found, skipping")
         return []
 
-    with open(filepath) as f:
-        data = json.load(f)
+    data = load_json(filepath)
 
     items = []
     for topic in data.get('topics', []):
@@ -130,8 +282,7 @@ def should_regenerate(output_dir: Path, data_dir: Path, force: bool) -> bool:
         return True
 
     try:
-        with open(metadata_file) as f:
-            metadata = json.load(f)
+        metadata = load_json(metadata_file)
         current_hash = compute_content_hash(data_dir)
         return metadata.get("contentHash") != current_hash
     except Exception:
@@ -223,12 +374,13 @@ def combine_text_for_embedding(item: Dict[str, Any]) -> str:
     return ". ".join(parts)
 
 
+NON_SLUG_CHARS = re.compile(r'[^a-z0-9]+')
+
+
 def slugify(text: str) -> str:
     """Convert text to URL-safe slug (matches JS slugify exactly)."""
-    import re
-    # Lowercase, replace non-alphanumeric with hyphens, strip leading/trailing hyphens
-    slug = re.sub(r'[^a-z0-9]+', '-', text.lower())
-    return re.sub(r'^-|-$', '', slug)[:100]
+    # Lowercase, replace non-alphanumeric runs with one hyphen, strip leading/trailing hyphens
+    return NON_SLUG_CHARS.sub('-', text.lower()).strip('-')[:100]
 
 
 def load_all_items(data_dir: Path) -> List[Dict[str, Any]]:
@@ -242,8 +394,7 @@ def load_all_items(data_dir: Path) -> List[Dict[str, Any]]:
             print(f"Warning: {filename} not found, skipping")
             continue
 
-        with open(filepath) as f:
-            items = json.load(f)
+        items = load_json(filepath)
 
         item_type = FILE_TO_TYPE.get(filename, "unknown")
 
@@ -455,9 +606,10 @@ def write_quantized_embeddings(embeddings, output_file: Path):
     ranges = maxs - mins
     ranges[ranges == 0] = 1
 
-    # Quantize to 0-255 range
+    # Quantize to 0-255 range (round to nearest level rather than truncate,
+    # halving the worst-case error; the client decodes q / 255 * range + min)
     normalized = (embeddings - mins[:, np.newaxis]) / ranges[:, np.newaxis]
-    quantized = (normalized * 255).astype('uint8')
+    quantized = np.rint(normalized * 255).astype('uint8')
 
     with open(output_file, 'wb') as f:
         # Header: count, dimensions
@@ -471,6 +623,40 @@ def write_quantized_embeddings(embeddings, output_file: Path):
     return count * dim  # Return original float count for size comparison
 
 
+def write_legacy_embeddings(items: List[Dict[str, Any]], embeddings, output_file: Path):
+    """
+    Write the legacy JSON format (item fields + embedding list per item).
+
+    Streams one item at a time, so only a single item's JSON is held in
+    memory rather than the whole ~40MB document.
+    """
+    import numpy as np
+
+    header = {
+        "model": "bge-large-en-v1.5",
+        "dimensions": EMBEDDING_DIM,
+        "count": len(items),
+    }
+
+    with open(output_file, 'wb') as f:
+        # Same bytes as dumping the full dict compactly: {...,"items":[...]}
+        f.write(dumps_json(header, indent=False)[:-1] + b',"items":[')
+        for i, item in enumerate(items):
+            if i:
+                f.write(b',')
+            f.write(dumps_json({
+                "id": item["id"],
+                "type": item["type"],
+                "name": item["name"],
+                "description": item["description"],
+                "category": item["category"],
+                "url": item["url"],
+                # Round embeddings to reduce file size (6 decimal places)
+                "embedding": np.round(embeddings[i].astype(np.float64), 6).tolist()
+            }, indent=False))
+        f.write(b']}')
+
+
 def compute_related_items(items: List[Dict[str, Any]], embeddings, top_k: int = 5) -> Dict[str, List[Dict[str, Any]]]:
     """
     Compute top-k related items for each item using cosine similarity.
@@ -528,35 +714,103 @@ def write_related_items(related: Dict[str, List[Dict[str, Any]]], output_file: P
         "items": related
     }
 
-    with open(output_file, 'w') as f:
-        json.dump(output, f, separators=(',', ':'))
+    dump_json(output, output_file, indent=False)
 
     print(f"  Related items: {output_file.stat().st_size / 1024:.1f} KB")
 
 
-def generate_all_outputs(items: List[Dict[str, Any]], model, output_dir: Path, content_hash: str):
+def compute_type_hashes(items: List[Dict[str, Any]], encoder: str) -> Dict[str, str]:
+    """
+    Hash the encoder and embedding texts of each content type, in item order.
+
+    encoder (see encoder_id) is part of the key so vectors from the ONNX INT8
+    and sentence-transformers backends are never mixed in one index.
+    """
+    hashers = {}
+    for item in items:
+        hasher = hashers.get(item["type"])
+        if hasher is None:
+            hasher = hashers[item["type"]] = hashlib.sha256(encoder.encode() + b"\0")
+        hasher.update(item["text_for_embedding"].encode() + b"\0")
+    return {item_type: hasher.hexdigest()[:16] for item_type, hasher in hashers.items()}
+
+
+def load_cached_embeddings(output_dir: Path, type_hashes: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Reuse embeddings from the previous run's search-embeddings.bin.
+
+    Returns {type: embedding rows} for each content type whose texts hash the
+    same as recorded in search-metadata.json, so only changed types need to
+    be re-encoded. Returns {} if the previous outputs are missing or invalid.
+    """
+    import numpy as np
+
+    try:
+        metadata = load_json(output_dir / "search-metadata.json")
+        previous_hashes = metadata.get("typeHashes", {})
+        count, dim = metadata["count"], metadata["dimensions"]
+        embeddings = np.fromfile(output_dir / "search-embeddings.bin", dtype='<f4')
+        if embeddings.size != count * dim or len(metadata["items"]) != count:
+            return {}
+    except Exception:
+        return {}
+
+    embeddings = embeddings.reshape(count, dim)
+    types = np.array([item["type"] for item in metadata["items"]])
+    return {
+        item_type: embeddings[types == item_type]
+        for item_type, type_hash in type_hashes.items()
+        if previous_hashes.get(item_type) == type_hash
+    }
+
+
+def generate_all_outputs(items: List[Dict[str, Any]], output_dir: Path, content_hash: str,
+                         reuse_cached: bool = True):
     """Generate all output files: metadata, binary embeddings, MiniSearch index, and legacy JSON."""
-    texts = [item["text_for_embedding"] for item in items]
+    import numpy as np
 
-    print(f"Generating embeddings for {len(texts)} items...")
-    embeddings = model.encode(texts, show_progress_bar=True, normalize_embeddings=True)
+    # Only re-encode content types whose embedding texts changed since the last run
+    type_hashes = compute_type_hashes(items, encoder_id())
+    cached = load_cached_embeddings(output_dir, type_hashes) if reuse_cached else {}
+    if cached:
+        print(f"Reusing embeddings for unchanged types: {', '.join(sorted(cached))}")
+    to_encode = [i for i, item in enumerate(items) if item["type"] not in cached]
+
+    # Embed each distinct text once, then scatter back to one row per item
+    text_ids = {}
+    inverse = [text_ids.setdefault(items[i]["text_for_embedding"], len(text_ids)) for i in to_encode]
+    unique_texts = list(text_ids)
+
+    encoded = None
+    if to_encode:
+        print(f"Generating embeddings for {len(to_encode)} items ({len(unique_texts)} unique texts)...")
+        print("Loading embedding model...")
+        encoded = get_model().encode(unique_texts, batch_size=EMBED_BATCH_SIZE, show_progress_bar=True,
+                                     normalize_embeddings=True)[inverse]
+
+    embeddings = np.empty((len(items), EMBEDDING_DIM), dtype=np.float32)
+    types = np.array([item["type"] for item in items])
+    for item_type, rows in cached.items():
+        embeddings[types == item_type] = rows
+    if encoded is not None:
+        embeddings[to_encode] = encoded
 
     # 1. Generate MiniSearch index
     print("Generating MiniSearch index...")
     minisearch_index = generate_minisearch_index(items)
     index_file = output_dir / "search-index.json"
-    with open(index_file, 'w') as f:
-        json.dump(minisearch_index, f, separators=(',', ':'))
+    dump_json(minisearch_index, index_file, indent=False)
     print(f"  MiniSearch index: {index_file.stat().st_size / 1024:.1f} KB")
 
     # 2. Build metadata (items without embeddings, for client-side matching)
     metadata = {
         "version": 5,  # Bumped for clustering/search fields
         "model": "bge-large-en-v1.5",
-        "dimensions": 1024,
+        "dimensions": EMBEDDING_DIM,
         "count": len(items),
         "generatedAt": datetime.utcnow().isoformat() + "Z",
         "contentHash": content_hash,
+        "typeHashes": type_hashes,
         "items": [{
             "id": item["id"],
             "type": item["type"],
@@ -584,8 +838,7 @@ def generate_all_outputs(items: List[Dict[str, Any]], model, output_dir: Path, c
 
     # Write metadata JSON
     metadata_file = output_dir / "search-metadata.json"
-    with open(metadata_file, 'w') as f:
-        json.dump(metadata, f, separators=(',', ':'))
+    dump_json(metadata, metadata_file, indent=False)
     print(f"  Metadata: {metadata_file.stat().st_size / 1024:.1f} KB")
 
     # 3. Write binary embeddings (Float32)
@@ -599,30 +852,8 @@ def generate_all_outputs(items: List[Dict[str, Any]], model, output_dir: Path, c
     print(f"  Quantized embeddings: {quantized_file.stat().st_size / 1024:.1f} KB")
 
     # 4. Legacy JSON format (for backwards compatibility during migration)
-    legacy_output = {
-        "model": "bge-large-en-v1.5",
-        "dimensions": 1024,
-        "count": len(items),
-        "items": []
-    }
-
-    for i, item in enumerate(items):
-        # Round embeddings to reduce file size (6 decimal places)
-        embedding_list = [round(float(x), 6) for x in embeddings[i]]
-
-        legacy_output["items"].append({
-            "id": item["id"],
-            "type": item["type"],
-            "name": item["name"],
-            "description": item["description"],
-            "category": item["category"],
-            "url": item["url"],
-            "embedding": embedding_list
-        })
-
     legacy_file = output_dir / "search-embeddings.json"
-    with open(legacy_file, 'w') as f:
-        json.dump(legacy_output, f, separators=(',', ':'))
+    write_legacy_embeddings(items, embeddings, legacy_file)
     print(f"  Legacy JSON: {legacy_file.stat().st_size / 1024:.1f} KB")
 
     # 5. Compute and write related items (semantic neighbors)
@@ -642,8 +873,13 @@ def main():
     parser = argparse.ArgumentParser(description='Generate search embeddings and indices')
     parser.add_argument('--force', action='store_true', help='Force regeneration even if content unchanged')
     parser.add_argument('--skip-cache-check', action='store_true', help='Skip content hash check')
+    parser.add_argument('--export-onnx', action='store_true',
+                        help='Export the model to INT8 ONNX (needs optimum[onnxruntime]) before encoding')
     args = parser.parse_args()
 
+    if args.export_onnx:
+        export_onnx_model()
+
     script_dir = Path(__file__).parent
     data_dir = script_dir.parent / "data"
     output_dir = script_dir.parent / "static" / "embeddings"
@@ -665,11 +901,8 @@ def main():
     content_hash = compute_content_hash(data_dir)
     print(f"Content hash: {content_hash}")
 
-    # Load model and generate all outputs
-    print("Loading sentence-transformers model...")
-    model = get_model()
-
-    generate_all_outputs(items, model, output_dir, content_hash)
+    # Generate all outputs (loads the model only if some type needs encoding)
+    generate_all_outputs(items, output_dir, content_hash, reuse_cached=not args.force)
 
     print("\nDone! All search files generated successfully.")
 
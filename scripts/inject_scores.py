@@ -7,11 +7,15 @@ Inject model scores into source JSON files and create category rankings.
 3. Creates category_rankings.json with ranked categories
 """
 
-import json
 import os
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 
+import numpy as np
+
+from json_io import dumps_json, load_json, parse_json
+
 # Source files to update
 SOURCE_FILES = [
     'packages.json',
@@ -24,13 +28,98 @@ SOURCE_FILES = [
     'books.json',
 ]
 
+def lookup_scores(names, ranked_names, ranked_scores):
+    """
+    Look up scores for an array of lowercased names in one vectorized pass.
+
+    ranked_names must be sorted; names not in it score 0.
+    """
+    if len(ranked_names) == 0:
+        return np.zeros(len(names))
+    idx = np.searchsorted(ranked_names, names)
+    idx[idx == len(ranked_names)] = 0
+    return np.where(ranked_names[idx] == names, ranked_scores[idx], 0.0)
+
+
+def process_file(filepath, ranked_names, ranked_scores):
+    """
+    Add model scores to one source file, sort it by score and save it.
+
+    Returns (content_type, category ranking list, summary line), or None if
+    the file does not exist.
+    """
+    if not filepath.exists():
+        return None
+
+    original = filepath.read_bytes()
+    items = parse_json(original)
+
+    filename = filepath.name
+    content_type = filename.replace('.json', '').replace('_flat', '')
+
+    # Score all items at once, then add scores and collect category indices
+    names = np.array([item.get('name', '').lower() for item in items], dtype=str)
+    scores = lookup_scores(names, ranked_names, ranked_scores)
+    cat_idx = np.zeros(len(items), dtype=np.intp)
+    cat_ids = {}  # category -> index, in first-appearance order
+    for i, (item, score) in enumerate(zip(items, scores.tolist())):
+        item['model_score'] = round(score, 4)
+        cat_idx[i] = cat_ids.setdefault(item.get('category', 'Uncategorized'), len(cat_ids))
+
+    engaged = scores > 0
+    matched = int(engaged.sum())
+
+    # Aggregate by category
+    num_cats = len(cat_ids)
+    # Sum in ascending score order so the float totals (and their rounding)
+    # do not depend on the order of items in the source file
+    by_score = np.argsort(scores, kind='stable')
+    totals = np.bincount(cat_idx[by_score], weights=scores[by_score], minlength=num_cats)
+    counts = np.bincount(cat_idx, minlength=num_cats)
+    engaged_counts = np.bincount(cat_idx[engaged], minlength=num_cats)
+    maxs = np.zeros(num_cats)
+    np.maximum.at(maxs, cat_idx, scores)
+
+    # Sort items by score descending
+    items.sort(key=lambda x: x.get('model_score', 0), reverse=True)
+
+    # Save updated file, skipping the write if nothing changed (dumps_json
+    # writes the same bytes as the json.dump(..., indent=2) that produced the
+    # committed files, with or without orjson)
+    updated = dumps_json(items)
+    changed = updated != original
+    if changed:
+        filepath.write_bytes(updated)
+
+    # Build category rankings for this content type
+    cat_list = []
+    for cat, total, count, best, engaged_count in zip(
+            cat_ids, totals.tolist(), counts.tolist(), maxs.tolist(), engaged_counts.tolist()):
+        cat_list.append({
+            'category': cat,
+            'total_score': round(total, 3),
+            'avg_score': round(total / count, 4),
+            'max_score': round(best, 4) if best > 0 else 0,
+            'count': count,
+            'engaged_count': engaged_count,
+        })
+
+    # Sort categories by total score, ties by name, so the order depends only
+    # on the scores and not on how the source file happened to be ordered
+    cat_list.sort(key=lambda x: (-x['total_score'], x['category']))
+
+    summary = f"  {filename}: {matched}/{len(items)} items matched, sorted by score"
+    if not changed:
+        summary += " (unchanged)"
+    return content_type, cat_list, summary
+
+
 def main():
     data_dir = Path(__file__).parent.parent / 'data'
 
     # Load global rankings
     rankings_path = data_dir / 'global_rankings.json'
-    with open(rankings_path) as f:
-        rankings_data = json.load(f)
+    rankings_data = load_json(rankings_path)
 
     # Build name -> score lookup (case-insensitive)
     score_lookup = {}
@@ -40,71 +129,35 @@ def main():
 
     print(f"Loaded {len(score_lookup)} scores from global_rankings.json")
 
+    # Sorted name/score arrays for vectorized lookup in the workers
+    ranked_names = np.array(sorted(score_lookup), dtype=str)
+    ranked_scores = np.array([score_lookup[name] for name in ranked_names.tolist()], dtype=float)
+
     # Track category scores by content type
     category_rankings = {}
 
-    # Process each source file
-    for filename in SOURCE_FILES:
-        filepath = data_dir / filename
-        if not filepath.exists():
-            print(f"  Skipping {filename} (not found)")
-            continue
-
-        with open(filepath) as f:
-            items = json.load(f)
-
-        content_type = filename.replace('.json', '').replace('_flat', '')
-        category_scores = defaultdict(lambda: {'total': 0, 'count': 0, 'max': 0, 'engaged': 0})
-
-        # Add scores to items
-        matched = 0
-        for item in items:
-            name = item.get('name', '').lower()
-            score = score_lookup.get(name, 0.0)
-            item['model_score'] = round(score, 4)
-
-            if score > 0:
-                matched += 1
-
-            # Aggregate by category
-            category = item.get('category', 'Uncategorized')
-            category_scores[category]['total'] += score
-            category_scores[category]['count'] += 1
-            category_scores[category]['max'] = max(category_scores[category]['max'], score)
-            if score > 0:
-                category_scores[category]['engaged'] += 1
-
-        # Sort items by score descending
-        items.sort(key=lambda x: x.get('model_score', 0), reverse=True)
-
-        # Save updated file
-        with open(filepath, 'w') as f:
-            json.dump(items, f, indent=2)
-
-        print(f"  {filename}: {matched}/{len(items)} items matched, sorted by score")
-
-        # Build category rankings for this content type
-        cat_list = []
-        for cat, stats in category_scores.items():
-            cat_list.append({
-                'category': cat,
-                'total_score': round(stats['total'], 3),
-                'avg_score': round(stats['total'] / stats['count'], 4) if stats['count'] > 0 else 0,
-                'max_score': round(stats['max'], 4),
-                'count': stats['count'],
-                'engaged_count': stats['engaged'],
-            })
-
-        # Sort categories by total score
-        cat_list.sort(key=lambda x: x['total_score'], reverse=True)
-        category_rankings[content_type] = cat_list
+    # Source files are independent: load, score, sort and save them in
+    # parallel worker processes (map keeps SOURCE_FILES order for output)
+    filepaths = [data_dir / filename for filename in SOURCE_FILES]
+    with ProcessPoolExecutor(max_workers=min(len(filepaths), os.cpu_count() or 1)) as executor:
+        results = executor.map(partial(process_file, ranked_names=ranked_names, ranked_scores=ranked_scores), filepaths)
+
+        for filepath, result in zip(filepaths, results):
+            if result is None:
+                print(f"  Skipping {filepath.name} (not found)")
+                continue
+            content_type, cat_list, summary = result
+            print(summary)
+            category_rankings[content_type] = cat_list
 
     # Save category rankings
     cat_rankings_path = data_dir / 'category_rankings.json'
-    with open(cat_rankings_path, 'w') as f:
-        json.dump(category_rankings, f, indent=2)
-
-    print(f"\nSaved category_rankings.json")
+    updated = dumps_json(category_rankings)
+    if cat_rankings_path.exists() and cat_rankings_path.read_bytes() == updated:
+        print(f"\ncategory_rankings.json unchanged")
+    else:
+        cat_rankings_path.write_bytes(updated)
+        print(f"\nSaved category_rankings.json")
 
     # Print top categories per content type
     print("\n" + "="*60)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Shared JSON load/dump helpers for the data scripts.
+
+Parsing uses orjson when installed (much faster) and falls back to the
+stdlib json module otherwise; both give identical Python objects.
+
+Writing always goes through the stdlib json module: 2-space indent with
+ASCII escapes and no trailing newline, the format every other script here
+writes (json.dump(..., indent=2)) and the committed data files use. orjson
+formats non-ASCII text and floats differently, so serializing with it would
+make the bytes depend on whether it is installed and rewrite whole files
+on the first run.
+"""
+
+import json
+from pathlib import Path
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def load_json(path):
+    """Load a JSON file."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(Path(path).read_bytes())
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def parse_json(raw):
+    """Parse JSON from a str or bytes buffer."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def dumps_json(data, indent=True):
+    """Serialize data to JSON bytes, formatted as dump_json writes it."""
+    if indent:
+        return json.dumps(data, indent=2).encode()
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def dump_json(data, path, indent=True):
+    """
+    Write data to a JSON file.
+
+    indent=True gives 2-space indented output (same bytes as
+    json.dump(data, f, indent=2)), for files people edit by hand. Use
+    indent=False for machine-only outputs (compact, no whitespace).
+    """
+    Path(path).write_bytes(dumps_json(data, indent))
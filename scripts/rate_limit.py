@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Shared request rate limiter for the threaded download scripts.
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """Space out request starts across threads to at most `rate` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
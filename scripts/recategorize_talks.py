@@ -4,10 +4,45 @@ Re-categorize talks.json with more granular subtopics.
 """
 
 import json
+import re
 from pathlib import Path
 
 DATA_FILE = Path(__file__).parent.parent / "data" / "talks.json"
 
+# Keyword triggers per subtopic; a subtopic matches if any keyword is a
+# substring of the talk text (checked in priority order in get_new_subtopic)
+SUBTOPIC_KEYWORDS = {
+    "ML & Causal": ["double ml", "causal forest", "heterogeneous treatment", "machine learning", "llm", "neural"],
+    "Experimentation": ["a/b test", "ab test", "experiment", "kohavi", "variance reduction", "cuped"],
+    "Bayesian Methods": ["bayesian", "pymc", "stan", "mcmc"],
+    "Causal Methods": ["course", "lecture", "seminar", "nber", "aea"],
+    "Economics Commentary": ["econtalk", "freakonomics", "planet money", "odd lots", "conversations with tyler", "macro musings", "economics, applied", "the pie"],
+    "Marketplace Economics": ["marketplace", "instacart", "doordash", "uber eats", "grubhub", "etsy", "airbnb"],
+    "Auction & Matching": ["auction", "matching", "market design", "alvin roth", "kidney", "school choice"],
+    "Antitrust": ["antitrust", "competition", "dma", "regulation", "lina khan", "stigler"],
+    "Network Effects": ["network effect", "two-sided", "glen weyl", "quadratic", "radical market"],
+    "Tech Interviews": ["amazon", "bajari", "jonathan hall"],
+    "AI & Labor": ["labor", "job", "work", "autor", "automation", "employment"],
+    "ML Engineering": ["mlops", "deployment", "production", "infrastructure"],
+    "Recommendations": ["recommend", "personalization"],
+    "Energy & Climate": ["energy", "climate", "utility", "electric"],
+    "Other Industries": ["healthcare", "insurance", "transport", "defense", "cyber"],
+    "Career Advice": ["career", "interview", "job", "hire", "resume"],
+}
+
+# One compiled alternation per subtopic: pattern.search(text) is equivalent
+# to any(k in text for k in keywords), but runs as a single C-level scan
+KEYWORD_PATTERNS = {
+    subtopic: re.compile("|".join(map(re.escape, keywords)))
+    for subtopic, keywords in SUBTOPIC_KEYWORDS.items()
+}
+
+
+def mentions(subtopic, text):
+    """True if text contains any of the subtopic's trigger keywords."""
+    return KEYWORD_PATTERNS[subtopic].search(text) is not None
+
+
 def get_new_subtopic(talk):
     """Assign new subtopic based on content analysis."""
     name = talk.get("name", "").lower()
@@ -23,16 +58,16 @@ def get_new_subtopic(talk):
         if talk_type in ["Podcast", "Podcast Series"] or "podcast" in name:
             return "Causal Podcasts"
         # ML & Causal
-        if any(x in content for x in ["double ml", "causal forest", "heterogeneous treatment", "machine learning", "llm", "neural"]):
+        if mentions("ML & Causal", content):
             return "ML & Causal"
         # A/B Testing / Experimentation
-        if any(x in content for x in ["a/b test", "ab test", "experiment", "kohavi", "variance reduction", "cuped"]):
+        if mentions("Experimentation", content):
             return "Experimentation"
         # Bayesian
-        if any(x in content for x in ["bayesian", "pymc", "stan", "mcmc"]):
+        if mentions("Bayesian Methods", content):
             return "Bayesian Methods"
         # Academic courses/seminars
-        if any(x in content for x in ["course", "lecture", "seminar", "nber", "aea"]):
+        if mentions("Causal Methods", content):
             return "Causal Methods"
         # Default
         return "Causal Inference"
@@ -41,22 +76,22 @@ def get_new_subtopic(talk):
     if current_macro == "Platforms & Markets":
         # General economics podcasts
         if talk_type in ["Podcast", "Podcast Series"]:
-            if any(x in name for x in ["econtalk", "freakonomics", "planet money", "odd lots", "conversations with tyler", "macro musings", "economics, applied", "the pie"]):
+            if mentions("Economics Commentary", name):
                 return "Economics Commentary"
         # Marketplace specific
-        if any(x in content for x in ["marketplace", "instacart", "doordash", "uber eats", "grubhub", "etsy", "airbnb"]):
+        if mentions("Marketplace Economics", content):
             return "Marketplace Economics"
         # Auction & Matching
-        if any(x in content for x in ["auction", "matching", "market design", "alvin roth", "kidney", "school choice"]):
+        if mentions("Auction & Matching", content):
             return "Auction & Matching"
         # Antitrust
-        if any(x in content for x in ["antitrust", "competition", "dma", "regulation", "lina khan", "stigler"]):
+        if mentions("Antitrust", content):
             return "Antitrust"
         # Network effects / two-sided
-        if any(x in content for x in ["network effect", "two-sided", "glen weyl", "quadratic", "radical market"]):
+        if mentions("Network Effects", content):
             return "Network Effects"
         # Tech industry interviews
-        if talk_type == "Interview" or any(x in content for x in ["amazon", "bajari", "jonathan hall"]):
+        if talk_type == "Interview" or mentions("Tech Interviews", content):
             return "Tech Interviews"
         # Platform theory
         return "Platform Strategy"
@@ -64,27 +99,27 @@ def get_new_subtopic(talk):
     # AI & TECHNOLOGY
     if current_macro == "AI & Technology":
         # AI & Labor
-        if any(x in content for x in ["labor", "job", "work", "autor", "automation", "employment"]):
+        if mentions("AI & Labor", content):
             return "AI & Labor"
         # MLOps
-        if any(x in content for x in ["mlops", "deployment", "production", "infrastructure"]):
+        if mentions("ML Engineering", content):
             return "ML Engineering"
         # Recommendations
-        if any(x in content for x in ["recommend", "personalization"]):
+        if mentions("Recommendations", content):
             return "Recommendations"
         return "AI Research"
 
     # INDUSTRY ECONOMICS
     if current_macro == "Industry Economics":
-        if any(x in content for x in ["energy", "climate", "utility", "electric"]):
+        if mentions("Energy & Climate", content):
             return "Energy & Climate"
-        if any(x in content for x in ["healthcare", "insurance", "transport", "defense", "cyber"]):
+        if mentions("Other Industries", content):
             return "Other Industries"
         return current_subtopic  # Keep Tech Industry, Gig Economy, Real Estate
 
     # LABOR & CAREERS
     if current_macro == "Labor & Careers":
-        if any(x in content for x in ["career", "interview", "job", "hire", "resume"]):
+        if mentions("Career Advice", content):
             return "Career Advice"
         if current_subtopic == "Tech Strategy":
             return "Tech Strategy"
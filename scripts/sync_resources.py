@@ -8,6 +8,7 @@ Usage:
 """
 
 import json
+import re
 from pathlib import Path
 
 DATA_DIR = Path(__file__).parent.parent / "data"
@@ -85,16 +86,13 @@ def extract_urls_from_source(data: list, source_name: str) -> list:
     return resources
 
 
+# Scheme and optional "www." stripped before comparing URLs
+URL_PREFIX = re.compile(r"^https?://(?:www\.)?")
+
+
 def normalize_url(url: str) -> str:
     """Normalize URL for comparison."""
-    url = url.lower().strip()
-    url = url.rstrip("/")
-    # Remove common prefixes for comparison
-    for prefix in ["https://www.", "http://www.", "https://", "http://"]:
-        if url.startswith(prefix):
-            url = url[len(prefix):]
-            break
-    return url
+    return URL_PREFIX.sub("", url.lower().strip().rstrip("/"), count=1)
 
 
 def main():
@@ -239,6 +239,12 @@ function handleLoadIndex(payload) {
 
 /**
  * Load embeddings (binary format - Float32 or quantized Int8)
+ *
+ * search-embeddings.bin: count * dim little-endian Float32, row-major.
+ * search-embeddings-q8.bin (written by scripts/generate_embeddings.py):
+ *   uint32 count, uint32 dim,
+ *   Float32[count] per-vector min, Float32[count] per-vector max,
+ *   Uint8[count * dim] values, decoded as q / 255 * (max - min) + min.
  */
 function handleLoadEmbeddings(payload) {
   try {